@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Compare the encoder backends on CPU: cold-start time, resident memory,
+single-query encode latency, and agreement with the sentence-transformers
+vectors. Each backend runs in a fresh interpreter so import and load costs
+are measured cold.
+
+    python scripts/bench_encoders.py [backend ...] [--queries N]
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+QUERIES = [
+    "send an email to my manager about the launch",
+    "make me a notion page",
+    "post a message in the #general slack channel",
+    "schedule a google meet with the team tomorrow at 10am",
+    "summarize my unread emails from today",
+    "create a notion database for tracking job applications",
+    "find the latest message from Alex in slack",
+    "reply to the last email thread about the budget",
+]
+
+
+def run_backend(backend: str, queries: int, vectors_path: str) -> dict:
+    import numpy as np
+
+    start = time.perf_counter()
+    from web7.search.encoders import create_encoder
+
+    imported = time.perf_counter()
+    encoder = create_encoder(backend)
+    loaded = time.perf_counter()
+    encoder.encode(QUERIES[0])
+    first = time.perf_counter()
+
+    latencies = []
+    for i in range(queries):
+        query = QUERIES[i % len(QUERIES)]
+        t = time.perf_counter()
+        encoder.encode(query)
+        latencies.append((time.perf_counter() - t) * 1000)
+
+    t = time.perf_counter()
+    vectors = encoder.encode(QUERIES, normalize_embeddings=True)
+    batch_ms = (time.perf_counter() - t) * 1000
+    np.save(vectors_path, vectors)
+
+    latencies.sort()
+    return {
+        "backend": backend,
+        "import_ms": round((imported - start) * 1000, 1),
+        "load_ms": round((loaded - imported) * 1000, 1),
+        "first_query_ms": round((first - loaded) * 1000, 1),
+        # ru_maxrss is in kilobytes on Linux.
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "p50_ms": round(latencies[len(latencies) // 2], 2),
+        "p99_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 2),
+        "batch_ms": round(batch_ms, 2),
+    }
+
+
+def main():
+    from web7.search.encoders import ENCODERS
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("backends", nargs="*", default=list(ENCODERS))
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--vectors", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_backend(args.child, args.queries, args.vectors)))
+        return
+
+    import numpy as np
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in args.backends:
+            vectors_path = os.path.join(tmp, f"{backend}.npy")
+            proc = subprocess.run(
+                [
+                    sys.executable,
+                    os.path.abspath(__file__),
+                    "--child",
+                    backend,
+                    "--queries",
+                    str(args.queries),
+                    "--vectors",
+                    vectors_path,
+                ],
+                cwd=project_root,
+                capture_output=True,
+                text=True,
+            )
+            if proc.returncode:
+                print(f"{backend}: failed\n{proc.stderr.strip().splitlines()[-1:]}")
+                continue
+            result = json.loads(proc.stdout.strip().splitlines()[-1])
+            result["vectors"] = np.load(vectors_path)
+            results.append(result)
+
+    reference = next(
+        (r["vectors"] for r in results if r["backend"] == "sentence-transformers"), None
+    )
+    columns = ["import_ms", "load_ms", "first_query_ms", "max_rss_mb", "p50_ms", "p99_ms", "batch_ms"]
+    print(f"{'backend':<24}" + "".join(f"{c:>15}" for c in columns) + f"{'min_cosine':>12}")
+    for result in results:
+        cosine = (
+            f"{float((result['vectors'] * reference).sum(axis=1).min()):.4f}"
+            if reference is not None
+            else "-"
+        )
+        print(
+            f"{result['backend']:<24}"
+            + "".join(f"{result[c]:>15}" for c in columns)
+            + f"{cosine:>12}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Recall and latency of the HNSW graph against exact search, on synthetic
+384-dim vectors, across search `ef` values. Also times the build, an
+incremental re-sync (5% of keys deleted, 5% inserted) and a save/load
+round trip.
+
+    python scripts/bench_hnsw.py [--sizes 1000 10000] [--ef 16 32 64 128]
+        [--m 16] [--impl all|numpy|hnswlib]
+
+With --impl all (the default) hnswlib is benchmarked too when installed.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from scripts.bench_quantized import synthetic_vectors  # noqa: E402
+from web7.search.hnsw import HnswIndex, HnswlibIndex, hnsw_class  # noqa: E402
+
+
+def exact_top_k(vectors: np.ndarray, keys: list[str], query, k: int) -> set[str]:
+    scores = vectors @ query
+    return {keys[i] for i in np.argpartition(-scores, k - 1)[:k]}
+
+
+def measure(index, vectors, keys, query_vectors, k: int, ef: int) -> dict:
+    latencies, hits = [], 0
+    for query in query_vectors:
+        expected = exact_top_k(vectors, keys, query, k)
+        start = time.perf_counter()
+        found = index.search(query, k, ef=ef)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += len(expected & {key for key, _ in found})
+    return {
+        "recall": hits / (k * len(query_vectors)),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+    }
+
+
+def run(cls, count: int, args, rng) -> None:
+    vectors = synthetic_vectors(count, rng)
+    keys = [f"tool-{i}" for i in range(count)]
+    picks = vectors[rng.integers(count, size=args.queries)]
+    query_vectors = picks + 0.3 * rng.normal(size=picks.shape).astype(np.float32)
+    query_vectors /= np.linalg.norm(query_vectors, axis=1, keepdims=True)
+
+    start = time.perf_counter()
+    index = cls(vectors.shape[1], m=args.m, ef_construction=args.ef_construction)
+    for key, vector in zip(keys, vectors):
+        index.add(key, vector)
+    build = time.perf_counter() - start
+
+    latencies = []
+    for query in query_vectors:
+        start = time.perf_counter()
+        exact_top_k(vectors, keys, query, args.k)
+        latencies.append((time.perf_counter() - start) * 1000)
+    print(
+        f"\n{count} entries, {cls.__name__} (m={args.m}): built in {build:.1f}s;"
+        f" exact scan p50 {np.percentile(latencies, 50):.2f}ms"
+        f" p99 {np.percentile(latencies, 99):.2f}ms"
+    )
+    print(f"{'ef':>6} {f'recall@{args.k}':>10} {'p50_ms':>8} {'p99_ms':>8}")
+    for ef in args.ef:
+        row = measure(index, vectors, keys, query_vectors, args.k, ef)
+        print(f"{ef:>6} {row['recall']:>10.3f} {row['p50_ms']:>8.2f} {row['p99_ms']:>8.2f}")
+
+    # Re-sync: drop 5% of the keys and add as many new ones.
+    changed = max(count // 20, 1)
+    removed = set(rng.choice(count, size=changed, replace=False).tolist())
+    added = synthetic_vectors(changed, rng)
+    start = time.perf_counter()
+    for i in removed:
+        index.delete(keys[i])
+    for i, vector in enumerate(added):
+        index.add(f"new-{i}", vector)
+    resync = time.perf_counter() - start
+
+    live = [i for i in range(count) if i not in removed]
+    vectors = np.concatenate([vectors[live], added])
+    keys = [keys[i] for i in live] + [f"new-{i}" for i in range(changed)]
+    row = measure(index, vectors, keys, query_vectors, args.k, args.ef[-1])
+    print(
+        f"re-sync of {changed} deletes + {changed} inserts in {resync:.2f}s;"
+        f" recall@{args.k} at ef={args.ef[-1]} afterwards {row['recall']:.3f}"
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.hnsw")
+        start = time.perf_counter()
+        index.save(path)
+        saved = time.perf_counter() - start
+        start = time.perf_counter()
+        loaded = cls.load(path)
+        load = time.perf_counter() - start
+        if loaded.dim != index.dim or loaded.get_vectors(keys[:2]).shape != (2, index.dim):
+            raise SystemExit(f"{cls.__name__} did not reload with dim {index.dim}")
+        if len(loaded) != len(index):
+            raise SystemExit(f"{cls.__name__} reloaded {len(loaded)} of {len(index)} keys")
+        size = sum(
+            os.path.getsize(os.path.join(tmp, name)) for name in os.listdir(tmp)
+        )
+        same = measure(loaded, vectors, keys, query_vectors, args.k, args.ef[-1])
+    print(
+        f"saved {size / 1e6:.1f}MB in {saved:.2f}s, loaded in {load:.2f}s;"
+        f" recall@{args.k} after load {same['recall']:.3f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--m", type=int, default=16)
+    parser.add_argument("--ef-construction", type=int, default=200)
+    parser.add_argument("--ef", type=int, nargs="+", default=[16, 32, 64, 128])
+    parser.add_argument(
+        "--impl", default="all", choices=["all", "auto", "numpy", "hnswlib"]
+    )
+    args = parser.parse_args()
+
+    if args.impl != "all":
+        classes = [hnsw_class(args.impl)]
+    else:
+        classes = [HnswIndex]
+        try:
+            import hnswlib  # noqa: F401
+
+            classes.append(HnswlibIndex)
+        except ImportError:
+            print("hnswlib is not installed; benchmarking the NumPy index only")
+
+    for cls in classes:
+        rng = np.random.default_rng(0)
+        for count in args.sizes:
+            run(cls, count, args, rng)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Recall, memory and latency of the quantized local index modes against exact
+float32 search, on synthetic 384-dim vectors served from a snapshot file.
+int8 trades a little latency for 4x less memory; binary is the fast mode and
+its recall depends on --binary-oversample.
+
+    python scripts/bench_quantized.py [--sizes 1000 10000 100000] [--k 10]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from web7.search.local_vector_index import LocalVectorIndex  # noqa: E402
+from web7.search.snapshot import load_snapshot, write_snapshot  # noqa: E402
+
+DIM = 384
+
+
+def synthetic_vectors(count: int, rng: np.random.Generator) -> np.ndarray:
+    # Clustered rather than uniform, like descriptions of similar servers.
+    centers = rng.normal(size=(max(count // 50, 1), DIM)).astype(np.float32)
+    vectors = centers[rng.integers(len(centers), size=count)]
+    vectors += 0.6 * rng.normal(size=(count, DIM)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def make_index(
+    snapshot, quantization: str, rescore: int, oversample: int | None = None
+) -> LocalVectorIndex:
+    index = LocalVectorIndex(
+        remote=SimpleNamespace(),
+        collection_name="bench",
+        quantization=quantization,
+        rescore=rescore,
+    )
+    if oversample:
+        index.binary_oversample = oversample
+    index.set_points(
+        snapshot.vectors, [{"name": str(i)} for i in range(len(snapshot))], normalized=True
+    )
+    return index
+
+
+def run(
+    count: int, queries: int, k: int, rescore: int, oversample: int | None, rng
+) -> list[dict]:
+    vectors = synthetic_vectors(count, rng)
+    picks = vectors[rng.integers(count, size=queries)]
+    query_vectors = picks + 0.3 * rng.normal(size=picks.shape).astype(np.float32)
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.w7vs")
+        write_snapshot(path, vectors, [{} for _ in range(count)], model="bench", normalized=True)
+        snapshot = load_snapshot(path)
+
+        exact = make_index(snapshot, "", rescore)
+        truth = [
+            {i for i, _ in exact.top_k(query, k)} for query in query_vectors
+        ]
+
+        for mode in ("", "int8", "binary"):
+            index = make_index(snapshot, mode, rescore, oversample)
+            latencies, hits = [], 0
+            for query, expected in zip(query_vectors, truth):
+                start = time.perf_counter()
+                found = index.top_k(query, k)
+                latencies.append((time.perf_counter() - start) * 1000)
+                hits += len(expected & {i for i, _ in found})
+
+            in_memory = index.quantized.nbytes if index.quantized else vectors.nbytes
+            rows.append(
+                {
+                    "entries": count,
+                    "mode": mode or "float32",
+                    f"recall@{k}": hits / (k * queries),
+                    "bytes/vector": round(in_memory / count, 1),
+                    "p50_ms": float(np.percentile(latencies, 50)),
+                    "p99_ms": float(np.percentile(latencies, 99)),
+                }
+            )
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rescore", type=int, default=100)
+    parser.add_argument(
+        "--binary-oversample",
+        type=int,
+        default=None,
+        help="Rescore pool multiplier for binary (default VECTOR_BINARY_OVERSAMPLE).",
+    )
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(
+        f"{'entries':>8} {'mode':>8} {f'recall@{args.k}':>10} {'bytes/vec':>10}"
+        f" {'p50_ms':>8} {'p99_ms':>8}"
+    )
+    for count in args.sizes:
+        for row in run(
+            count, args.queries, args.k, args.rescore, args.binary_oversample, rng
+        ):
+            print(
+                f"{row['entries']:>8} {row['mode']:>8} {row[f'recall@{args.k}']:>10.3f}"
+                f" {row['bytes/vector']:>10} {row['p50_ms']:>8.2f} {row['p99_ms']:>8.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Break down a cold start of the API server: time spent importing each package
+(via `python -X importtime`) and time spent initialising each shared resource.
+"""
+
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+
+def import_times(module: str) -> dict[str, float]:
+    """
+    Import time in milliseconds per top-level package, measured in a fresh
+    interpreter. Each module's self time is attributed to its root package so
+    nested imports are not double counted.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=project_root,
+        capture_output=True,
+        text=True,
+    )
+
+    totals: dict[str, float] = defaultdict(float)
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, _, name = line[len("import time:") :].split("|")
+        totals[name.strip().split(".")[0]] += int(self_us) / 1000
+    return dict(totals)
+
+
+async def initialise() -> dict:
+    from web7 import resources
+
+    await resources.warm_up()
+    resources.registry.ready_at = time.perf_counter()
+    return resources.startup_report()
+
+
+if __name__ == "__main__":
+    module = sys.argv[1] if len(sys.argv) > 1 else "web7.api"
+
+    print(f"Import time for {module} (cold interpreter):")
+    times = import_times(module)
+    for name, ms in sorted(times.items(), key=lambda item: -item[1])[:20]:
+        print(f"  {name:<30} {ms:>9.1f} ms")
+    print(f"  {'total':<30} {sum(times.values()):>9.1f} ms")
+
+    start = time.perf_counter()
+    __import__(module)
+    print(f"\nImport in this process: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    report = asyncio.run(initialise())
+    print("\nResource initialisation:")
+    for name, ms in report["resources_ms"].items():
+        print(f"  {name:<30} {ms:>9.1f} ms")
+    print(f"\nReady after {report['ready_after_ms']} ms")
@@ -1,23 +1,61 @@
-from letta_client import AsyncLetta
-import asyncio
-import ast
 import os
+import time
+from contextlib import nullcontext
+from typing import AsyncIterator
+
 from dotenv import load_dotenv
 
-from ..llm.groq import groq_complete, init_groq
+from ..llm.groq import groq_complete
+from ..resources import groq, groq_limiter, letta
 from ..models import WorkflowSession, StepStatus
-from .interface_search import detach_tools, mcp_search
+from ..timing import Stopwatch
+from .fast_path import fast_planner
+from .interface_search import _mcp_search, detach_tools
+from .log_summarizer import StepLogSummarizer
+from .plan_cache import plan_cache
+from .prefetch import ToolPrefetcher
+from .plan import PlannedTask, PlanStreamParser, stream_plan
+from .routing import router
 
 load_dotenv()
 
-client = AsyncLetta(token=os.getenv("LETTA_API_KEY"))
-groq = init_groq()
 
+async def stream_task_list(
+    agent_id, user_input, session: WorkflowSession = None
+) -> AsyncIterator[PlannedTask]:
+    """
+    Yield the planned tasks one by one while the planner is still writing the
+    rest of the list. A cached plan for a near-identical query is used
+    instead when there is one, and a single-intent query can be planned as
+    one step without the LLM (see `FastPathPlanner`).
+    """
+    client = letta()
+    with session.span("detach") if session else nullcontext():
+        await detach_tools(agent_id)
+
+    cached = await plan_cache.lookup(user_input)
+    fast_plan, decision = (
+        await fast_planner.plan(user_input) if cached is None else (None, None)
+    )
+    if cached is not None or fast_plan is not None:
+        for task in cached or fast_plan:
+            yield task
+        await client.agents.blocks.modify(
+            agent_id=agent_id,
+            block_label="tasks",
+            value=str(
+                [
+                    {"task": t.task, "depends_on": t.depends_on}
+                    for t in cached or fast_plan
+                ]
+            ),
+        )
+        return
 
-async def generate_task_list(agent_id, user_input) -> list[str]:
-    await detach_tools(agent_id)
+    start = time.perf_counter()
     stream = client.agents.messages.create_stream(
         agent_id=agent_id,
+        stream_tokens=True,
         messages=[
             {
                 "role": "user",
@@ -38,28 +76,47 @@ async def generate_task_list(agent_id, user_input) -> list[str]:
                             3. If the prompt is very simple (e.g., "send an email"), it's acceptable to have only one task.
                             4. Avoid overlapping or redundant tasks.
                             5. Ensure that the sequence of tasks, if followed, would fulfill the user's request.
+                            6. For each task, list the zero-based indices of the earlier tasks whose results it needs in "depends_on". Tasks that do not need each other's results must not depend on each other, so they can run at the same time.
 
-                            Output your response as a Python list containing strings, where each string represents a single task. Do not include any explanation or additional text outside of the Python list. REMINDER: DO NOT USE ANY TOOL CALLS IN THIS PART.
+                            Output your response as a JSON list of objects, each with a "task" string and a "depends_on" list of integers. Do not include any explanation or additional text outside of the JSON list. REMINDER: DO NOT USE ANY TOOL CALLS IN THIS PART.
 
                             For example:
-                            ["Task 1", "Task 2", "Task 3"]""",
+                            [{{"task": "Task 1", "depends_on": []}}, {{"task": "Task 2", "depends_on": []}}, {{"task": "Task 3", "depends_on": [0, 1]}}]""",
             }
         ],
     )
 
-    task_list = ""
-    async for m in stream:
-        print(m)
-        if m.message_type == "assistant_message":
-            task_list = m.content
-
+    chunks = []
+    planned = []
+
+    async def assistant_text():
+        async for m in stream:
+            if m.message_type == "assistant_message":
+                chunks.append(m.content)
+                yield m.content
+
+    parser = PlanStreamParser()
+    async for task in stream_plan(assistant_text(), parser):
+        print("planned task:", task)
+        planned.append(task)
+        yield task
+
+    elapsed = time.perf_counter() - start
+    if decision is not None:
+        fast_planner.compare(user_input, decision, planned, elapsed)
+    # A plan cut short would be replayed for the whole TTL, so only complete
+    # ones are cached.
+    await plan_cache.store(user_input, planned if parser.done else [], elapsed)
     await client.agents.blocks.modify(
-        agent_id=agent_id, block_label="tasks", value=task_list
+        agent_id=agent_id, block_label="tasks", value="".join(chunks)
     )
-    return ast.literal_eval(task_list)
 
 
-async def create_log(session: WorkflowSession, message: str):
+async def generate_task_list(agent_id, user_input) -> list[PlannedTask]:
+    return [task async for task in stream_task_list(agent_id, user_input)]
+
+
+async def summarize_log(message: str) -> str:
     system_prompt = """
     You will be given a thought process or results from an AI model. Your task is to summarize this thought process in five words or less. 
     Carefully analyze the provided thought process. Identify the key actions, decisions, or steps that the AI model took to complete its task. 
@@ -77,20 +134,64 @@ async def create_log(session: WorkflowSession, message: str):
 
     Provide your ten-word (or less) summary. Do not include any additional explanation or justification.
     """
-    details = await groq_complete(groq, system_prompt, user_prompt)
+    return await groq_complete(groq(), system_prompt, user_prompt, groq_limiter())
+
 
-    session.logs.append(details)
+async def create_log(session: WorkflowSession, message: str):
+    details = await summarize_log(message)
+
+    session.append_log(details)
 
     return details
 
 
-async def accomplish_task(session: WorkflowSession, task, task_number):
-    await detach_tools(session.agent_id)
-    response = await mcp_search(session.agent_id, task, k=1)
+async def accomplish_task(
+    session: WorkflowSession,
+    task,
+    task_number,
+    agent_id: str = None,
+    context: str = None,
+    prefetcher: ToolPrefetcher = None,
+) -> str:
+    """
+    Run one step on `agent_id` (the session's agent by default) and return the
+    agent's final answer. `context` carries the results of the steps this one
+    depends on, which matters when it runs on a separate branch agent.
+    Tool discovery started earlier by `prefetcher` is used when available.
+    Each phase is recorded as a timing span on the step.
+    """
+    client = letta()
+    agent_id = agent_id or session.agent_id
+    step_id = f"step_{task_number}"
+    watch = Stopwatch()
+    start = time.perf_counter()
+    discovery = None
+    if prefetcher is not None:
+        with session.span("discovery_wait", step_id):
+            discovery, prefetch_metrics = await prefetcher.take(step_id, task)
+        session.record_step_metrics(step_id, **prefetch_metrics)
+    response = await _mcp_search(agent_id, task, k=1, discovery=discovery)
+    routed = time.perf_counter()
+    # A prefetched discovery's spans ran before this step started.
+    session.record_spans(response["spans"], step_id)
     print(response)
     mcp_server_img_url = response["mcp_server_img_url"]
+    session.record_step_metrics(
+        step_id, tools=response["tools"], routing=response["routing"]
+    )
+    context_prompt = (
+        f"""
+Here are the results of the earlier steps this task builds on:
+<context>
+{context}
+</context>
+"""
+        if context
+        else ""
+    )
+    letta_watch = Stopwatch()
     stream = client.agents.messages.create_stream(
-        agent_id=session.agent_id,
+        agent_id=agent_id,
         messages=[
             {
                 "role": "user",
@@ -101,6 +202,7 @@ Here is the task you need to complete:
 <task>
 {task}
 </task>
+{context_prompt}
 
 Process for completing the task:
 1. Analyze the task and determine which tools you need to use.
@@ -128,45 +230,86 @@ Now, please proceed with the task using the provided tools and following the ins
         ],
     )
 
-    messages = []
-    tasks = []
-    async for message in stream:
-        messages.append(message)
-        tasks.append(asyncio.create_task(create_log(session, message)))
-        print(message)
-
-    if f"task {task_number}" in [
-        b.label for b in await client.agents.blocks.list(agent_id=session.agent_id)
-    ]:
-        await client.agents.blocks.modify(
-            agent_id=session.agent_id,
-            block_label=f"task {task_number}",
-            value=str(messages),
-        )
-    else:
-        block = await client.blocks.create(
-            label=f"task {task_number}",
-            description="A block to store information {task}",
-            value=str(messages),
-            limit=40000,
+    async def timed_summary(text: str) -> str:
+        with session.span("summarize", step_id):
+            return await summarize_log(text)
+
+    summarizer = StepLogSummarizer(session, step_id, timed_summary)
+    try:
+        messages = []
+        answer = ""
+        tool_calls = tool_errors = 0
+        async for message in stream:
+            if not messages:
+                session.record_spans([letta_watch.span("letta_first_message")], step_id)
+            messages.append(message)
+            summarizer.feed(message)
+            if message.message_type == "assistant_message":
+                answer = message.content
+            elif message.message_type == "tool_call_message":
+                tool_calls += 1
+            elif message.message_type == "tool_return_message":
+                tool_errors += getattr(message, "status", None) == "error"
+            print(message)
+        session.record_spans([letta_watch.span("letta_stream")], step_id)
+
+        router.log(
+            {
+                "agent_id": agent_id,
+                "step_id": step_id,
+                "query": session.query,
+                "task": task,
+                "routing": response["routing"],
+                "servers": response["mcp_servers"],
+                "routing_ms": round((routed - start) * 1000, 1),
+                "agent_ms": round((time.perf_counter() - routed) * 1000, 1),
+                "tool_calls": tool_calls,
+                "tool_errors": tool_errors,
+                "answered": bool(answer),
+            }
         )
-        print("new block created")
-        await client.agents.blocks.attach(agent_id=session.agent_id, block_id=block.id)
-
-    details = await create_log(session, str(messages))
 
+        with session.span("block_write", step_id):
+            if f"task {task_number}" in [
+                b.label for b in await client.agents.blocks.list(agent_id=agent_id)
+            ]:
+                await client.agents.blocks.modify(
+                    agent_id=agent_id,
+                    block_label=f"task {task_number}",
+                    value=str(messages),
+                )
+            else:
+                block = await client.blocks.create(
+                    label=f"task {task_number}",
+                    description="A block to store information {task}",
+                    value=str(messages),
+                    limit=40000,
+                )
+                print("new block created")
+                await client.agents.blocks.attach(agent_id=agent_id, block_id=block.id)
+
+        details = await summarizer.finish(str(messages))
+        session.record_step_metrics(step_id, logs=summarizer.stats())
+    finally:
+        # No-op after `finish`; otherwise stops the window timer and the
+        # summaries still running for a step that failed.
+        await summarizer.aclose()
+
+    step_span = watch.span("step")
+    session.record_spans([step_span], step_id)
     session.update_step(
-        step_id=f"step_{task_number}",
+        step_id=step_id,
         status=StepStatus.UPDATED,
         mcp_server_img_url=mcp_server_img_url,
         details=details,
+        duration=step_span["duration_ms"],
     )
 
-    await asyncio.gather(*tasks, return_exceptions=True)
+    return answer
 
 
 async def intialize_agent():
-    agent_state = await client.agents.create(
+    agent_state = await letta().agents.create(
         model="anthropic/claude-3-5-sonnet-20241022",
         embedding="openai/text-embedding-3-small",
         memory_blocks=[
@@ -200,5 +343,6 @@ async def main():
     # print(task)
     # print()
 
-    for i, task in enumerate(task_list):
-        await accomplish_task(session, task, i)
+    for task in task_list:
+        session.add_step(action=task.task)
+        await accomplish_task(session, task.task, task.index + 1)
@@ -0,0 +1,205 @@
+import asyncio
+import os
+import time
+from collections import deque
+
+from ..resources import letta
+from .interface_search import detach_tools, tool_reconciler
+
+PERSONA = (
+    "I am an AI assistant agent tailored towards executing"
+    "workflows using tools to accomplish the user's task."
+)
+
+# Blocks every pooled agent starts with; anything else was added by a
+# workflow and is removed when the agent is recycled.
+STANDARD_BLOCKS = {"human": "", "persona": PERSONA}
+
+
+async def create_agent() -> str:
+    agent = await letta().agents.create(
+        model="anthropic/claude-sonnet-4-20250514",
+        embedding="openai/text-embedding-3-small",
+        memory_blocks=[
+            {"label": label, "value": value} for label, value in STANDARD_BLOCKS.items()
+        ],
+    )
+    return agent.id
+
+
+class AgentPool:
+    """
+    Keeps `size` Letta agents with the standard persona and blocks ready so a
+    workflow can start without waiting on `agents.create`.
+
+    `acquire` hands out a ready agent (creating one only when the pool is
+    empty) and tops the pool back up in the background. `release` recycles an
+    agent into the pool by resetting its messages and blocks and detaching
+    its tools, or deletes it when the pool is already full.
+    """
+
+    def __init__(self, size: int | None = None):
+        self.size = size if size is not None else int(os.getenv("AGENT_POOL_SIZE", 2))
+        self._ready: deque[str] = deque()
+        self._creating = 0
+        self._refill_task: asyncio.Task | None = None
+        self._tasks: set[asyncio.Task] = set()
+        self._closed = False
+
+        self.hits = 0
+        self.misses = 0
+        self.created = 0
+        self.recycled = 0
+        self.deleted = 0
+        self.failed = 0
+        self.acquire_ms: deque[float] = deque(maxlen=100)
+
+    def __len__(self) -> int:
+        return len(self._ready)
+
+    def start(self) -> None:
+        self._closed = False
+        self.refill()
+
+    def refill(self) -> None:
+        """
+        Top the pool up to `size` in the background; a no-op while a refill
+        is already running.
+        """
+        if self._closed or (self._refill_task and not self._refill_task.done()):
+            return
+        if len(self._ready) + self._creating >= self.size:
+            return
+        self._refill_task = asyncio.create_task(self._refill())
+
+    async def _refill(self) -> None:
+        missing = self.size - len(self._ready) - self._creating
+        if missing <= 0:
+            return
+
+        self._creating += missing
+        try:
+            results = await asyncio.gather(
+                *[create_agent() for _ in range(missing)], return_exceptions=True
+            )
+        finally:
+            self._creating -= missing
+
+        for result in results:
+            if isinstance(result, Exception):
+                print(f"agent pool refill failed: {result}")
+                self.failed += 1
+                continue
+            self.created += 1
+            # A recycled agent may have filled the slot while we waited.
+            if self._closed or len(self._ready) >= self.size:
+                self._spawn(self._delete(result))
+            else:
+                self._ready.append(result)
+
+    async def acquire(self) -> str:
+        start = time.perf_counter()
+        if self._ready:
+            self.hits += 1
+            agent_id = self._ready.popleft()
+        else:
+            self.misses += 1
+            agent_id = await create_agent()
+            self.created += 1
+        self.acquire_ms.append((time.perf_counter() - start) * 1000)
+        self.refill()
+        return agent_id
+
+    async def release(self, agent_id: str, recycle: bool = True) -> None:
+        """
+        Return an agent handed out by `acquire`. It goes back into the pool if
+        there is room and it can be reset, otherwise it is deleted.
+        """
+        if recycle and not self._closed and len(self._ready) < self.size:
+            try:
+                await self._reset(agent_id)
+            except Exception as e:
+                print(f"failed to recycle agent {agent_id}: {e}")
+            else:
+                self.recycled += 1
+                self._ready.append(agent_id)
+                return
+        await self._delete(agent_id)
+
+    def release_later(self, agent_id: str, recycle: bool = True) -> None:
+        self._spawn(self.release(agent_id, recycle=recycle))
+
+    async def _reset(self, agent_id: str) -> None:
+        client = letta()
+        await detach_tools(agent_id)
+        await client.agents.messages.reset(
+            agent_id=agent_id, add_default_initial_messages=True
+        )
+
+        resets = []
+        for block in await client.agents.blocks.list(agent_id=agent_id):
+            if block.label in STANDARD_BLOCKS:
+                if block.value != STANDARD_BLOCKS[block.label]:
+                    resets.append(
+                        client.agents.blocks.modify(
+                            agent_id=agent_id,
+                            block_label=block.label,
+                            value=STANDARD_BLOCKS[block.label],
+                        )
+                    )
+            else:
+                resets.append(self._drop_block(agent_id, block.id))
+        await asyncio.gather(*resets)
+
+    async def _drop_block(self, agent_id: str, block_id: str) -> None:
+        client = letta()
+        await client.agents.blocks.detach(agent_id=agent_id, block_id=block_id)
+        await client.blocks.delete(block_id=block_id)
+
+    async def _delete(self, agent_id: str) -> None:
+        try:
+            await letta().agents.delete(agent_id=agent_id)
+        except Exception as e:
+            print(f"failed to delete agent {agent_id}: {e}")
+            self.failed += 1
+            return
+        finally:
+            tool_reconciler.forget(agent_id)
+        self.deleted += 1
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def close(self) -> None:
+        """
+        Stop refilling and delete every agent still waiting in the pool.
+        """
+        self._closed = True
+        if self._refill_task is not None:
+            await asyncio.gather(self._refill_task, return_exceptions=True)
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        ready = list(self._ready)
+        self._ready.clear()
+        await asyncio.gather(*[self._delete(agent_id) for agent_id in ready])
+
+    def stats(self) -> dict:
+        acquires = self.hits + self.misses
+        latencies = sorted(self.acquire_ms)
+        return {
+            "size": self.size,
+            "ready": len(self._ready),
+            "creating": self._creating,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / acquires if acquires else 0.0,
+            "created": self.created,
+            "recycled": self.recycled,
+            "deleted": self.deleted,
+            "failed": self.failed,
+            "acquire_ms_p50": latencies[len(latencies) // 2] if latencies else None,
+        }
+
+
+agent_pool = AgentPool()
@@ -4,12 +4,12 @@ import os
 import dotenv
 from pprint import pprint
 import asyncio
-from letta_client import LlmConfig, AsyncLetta, StreamableHttpServerConfig
+from letta_client import LlmConfig, StreamableHttpServerConfig
 
+from ..resources import letta
 from .interface_search import attach_tools
 
 dotenv.load_dotenv()
-client = AsyncLetta(token=os.getenv("LETTA_API_KEY"))
 app = FastAPI(
     title="Web7 Vector Search API",
     description="API for MCP server search",
@@ -19,7 +19,7 @@ running_tasks = set()
 
 
 async def init_letta():
-    await client.tools.add_mcp_server(
+    await letta().tools.add_mcp_server(
         request=StreamableHttpServerConfig(
             server_name="search", server_url=os.getenv("SEARCH_MCP_ENDPOINT")
         )
@@ -27,6 +27,7 @@ async def init_letta():
 
 
 async def create_agent(tool_id: int):
+    client = letta()
     search_tool = await client.tools.add_mcp_tool("search", "mcp_search")
     agent = await client.agents.create(
         model="anthropic/claude-sonnet-4-20250514",
@@ -0,0 +1,206 @@
+import os
+import re
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+import orjson
+
+from ..search.vector_service import search_vectors
+from .plan import PlannedTask
+from .routing import router
+
+# Words and marks that usually join two requests in one query.
+_CONJUNCTION = re.compile(
+    r"\b(and|then|also|after|afterwards|before|plus|while|once|as well as|followed by)\b"
+    r"|[,;&\n]|[.!?]\s+\S",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class FastPathDecision:
+    single: bool
+    reason: str
+    words: int
+    top_server: Optional[str] = None
+    top_score: Optional[float] = None
+    margin: Optional[float] = None
+    elapsed_ms: float = 0.0
+
+
+class FastPathPlanner:
+    """
+    Plans single-intent queries locally instead of asking the LLM planner.
+
+    A query counts as single-intent when it has at most `max_words` words, no
+    conjunction or second clause, and its best catalog match scores at least
+    `min_score` and leads the runner-up by `min_margin`. Such a query becomes
+    a one-step plan with the query as its task.
+
+    FAST_PATH selects the mode: "on" uses the one-step plan, "shadow" (the
+    default) still plans with the LLM but records whether the two agreed, and
+    "off" skips the check. With FAST_PATH_LOG set, shadow comparisons are
+    appended to that JSONL file for tuning the thresholds. The records
+    include the query and planned task text, so the log is off by default.
+    """
+
+    def __init__(
+        self,
+        mode: str | None = None,
+        max_words: int | None = None,
+        min_score: float | None = None,
+        min_margin: float | None = None,
+        log_path: str | None = None,
+    ):
+        self.mode = mode or os.getenv("FAST_PATH", "shadow")
+        if self.mode not in ("on", "shadow", "off"):
+            raise ValueError(f"unknown FAST_PATH {self.mode!r}, expected on, shadow or off")
+        self.max_words = max_words or int(os.getenv("FAST_PATH_MAX_WORDS", 12))
+        self.min_score = (
+            min_score
+            if min_score is not None
+            else float(os.getenv("FAST_PATH_MIN_SCORE", 0.45))
+        )
+        self.min_margin = (
+            min_margin
+            if min_margin is not None
+            else float(os.getenv("FAST_PATH_MIN_MARGIN", 0.1))
+        )
+        self.log_path = log_path if log_path is not None else os.getenv(
+            "FAST_PATH_LOG", ""
+        )
+
+        self.decisions = 0
+        self.reasons: Counter = Counter()
+        self.fast_plans = 0
+        self.classify_ms = 0.0
+        # Shadow outcomes, with the LLM plan as ground truth for "single step".
+        self.outcomes: Counter = Counter()
+
+    async def classify(self, query: str) -> FastPathDecision:
+        start = time.perf_counter()
+        decision = await self._classify(query)
+        decision.elapsed_ms = round((time.perf_counter() - start) * 1000, 2)
+        self.decisions += 1
+        self.reasons[decision.reason] += 1
+        self.classify_ms += decision.elapsed_ms
+        return decision
+
+    async def _classify(self, query: str) -> FastPathDecision:
+        words = len(query.split())
+        if words > self.max_words:
+            return FastPathDecision(False, "long", words)
+        if _CONJUNCTION.search(query.strip()):
+            return FastPathDecision(False, "conjunction", words)
+
+        # The same k as the step's own tool discovery, so that search is a
+        # cache hit when the query becomes the only task.
+        response = await search_vectors(query, max(2, router.max_servers))
+        servers = response.servers if response.success else []
+        if not servers or any(server.score is None for server in servers):
+            return FastPathDecision(False, "no_match", words)
+
+        # Hybrid search returns its fused order, not score order.
+        servers = sorted(servers, key=lambda server: -server.score)
+        top = servers[0]
+        margin = top.score - servers[1].score if len(servers) > 1 else None
+        decision = FastPathDecision(
+            False,
+            "single_intent",
+            words,
+            top_server=top.name,
+            top_score=round(top.score, 3),
+            margin=None if margin is None else round(margin, 3),
+        )
+        if top.score < self.min_score:
+            decision.reason = "weak_match"
+        elif margin is not None and margin < self.min_margin:
+            decision.reason = "ambiguous"
+        else:
+            decision.single = True
+        return decision
+
+    async def plan(
+        self, query: str
+    ) -> tuple[Optional[list[PlannedTask]], Optional[FastPathDecision]]:
+        """
+        The one-step plan for `query` if the fast path is on and the query is
+        single-intent, and the decision (None when the fast path is off).
+        """
+        if self.mode == "off":
+            return None, None
+        try:
+            decision = await self.classify(query)
+        except Exception as e:
+            print(f"Fast-path classification failed: {e}")
+            return None, None
+        if self.mode == "on" and decision.single:
+            self.fast_plans += 1
+            return [PlannedTask(0, query, [])], decision
+        return None, decision
+
+    def compare(
+        self,
+        query: str,
+        decision: FastPathDecision,
+        planned: list[PlannedTask],
+        plan_s: float,
+    ) -> None:
+        """
+        Record how a shadow decision matched the LLM's plan for the same query.
+        """
+        llm_single = len(planned) == 1
+        if decision.single:
+            outcome = "agree_single" if llm_single else "false_single"
+        else:
+            outcome = "missed_single" if llm_single else "agree_multi"
+        self.outcomes[outcome] += 1
+        if not self.log_path:
+            return
+        record = {
+            "ts": time.time(),
+            "query": query,
+            **asdict(decision),
+            "outcome": outcome,
+            "llm_tasks": [task.task for task in planned],
+            "llm_plan_s": round(plan_s, 3),
+        }
+        try:
+            with open(self.log_path, "ab") as file:
+                file.write(orjson.dumps(record) + b"\n")
+        except OSError as e:
+            print(f"Failed to write fast-path log {self.log_path}: {e}")
+
+    def stats(self) -> dict:
+        compared = sum(self.outcomes.values())
+        agreed = self.outcomes["agree_single"] + self.outcomes["agree_multi"]
+        predicted = self.outcomes["agree_single"] + self.outcomes["false_single"]
+        actual = self.outcomes["agree_single"] + self.outcomes["missed_single"]
+        return {
+            "mode": self.mode,
+            "max_words": self.max_words,
+            "min_score": self.min_score,
+            "min_margin": self.min_margin,
+            "decisions": self.decisions,
+            "reasons": dict(self.reasons),
+            "fast_plans": self.fast_plans,
+            "mean_classify_ms": round(self.classify_ms / self.decisions, 2)
+            if self.decisions
+            else None,
+            "shadow": {
+                **dict(self.outcomes),
+                "compared": compared,
+                "agreement": agreed / compared if compared else None,
+                # Of the queries the fast path would take, how many the LLM
+                # also planned as one step, and how many one-step plans it caught.
+                "precision": (
+                    self.outcomes["agree_single"] / predicted if predicted else None
+                ),
+                "recall": self.outcomes["agree_single"] / actual if actual else None,
+            },
+        }
+
+
+fast_planner = FastPathPlanner()
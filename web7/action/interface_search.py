@@ -1,23 +1,28 @@
 import asyncio
 import dotenv
-from dataclasses import dataclass
+from dataclasses import dataclass, field, replace
 import json
 import os
 import requests
 from typing import Self
 
-from letta_client import AsyncLetta, StreamableHttpServerConfig, Tool, SseServerConfig
+from letta_client import StreamableHttpServerConfig, Tool
 
 from mcp.server.fastmcp import FastMCP
 
-from ..search.vector_service import search_vectors
+from ..models import SearchQuery
+from ..resources import embedding_service, tool_index
+from ..search.vector_service import search_vectors, search_vectors_batch
+from ..timing import timed
+from .mcp_registry import mcp_registry
+from .routing import router
+from .tool_reconciler import ReconcileReport, ToolReconciler
 
 dotenv.load_dotenv()
 
 mcp = FastMCP("search", stateless_http=True)
 mcp.settings.port = 3001
 
-client = AsyncLetta(token=os.getenv("LETTA_API_KEY"))
 system_tools = [
     "tool-049053cc-0d04-4b2a-895b-68abfb46995e",  # send_message
     "tool-0c6f958b-61aa-4bb3-8bde-8ce836af9a77",  # core_memory_replace
@@ -29,6 +34,8 @@ system_tools = [
     "tool-ee39ac08-1c08-4dcf-9b0d-c3f6e086c27d",  # web_search
 ]
 
+tool_reconciler = ToolReconciler(protected=system_tools)
+
 
 @dataclass
 class McpServer:
@@ -37,6 +44,7 @@ class McpServer:
     url: str
     image_url: str
     authentication: str
+    score: float = None
 
 
 @dataclass
@@ -53,75 +61,146 @@ class McpResponse:
         )
 
 
-async def detach_tools(agent_id: str) -> None:
-    attached_tools: list[Tool] = await client.agents.tools.list(agent_id=agent_id)
-
-    detach_tasks = []
-    for attached_tool in attached_tools:
-        if (
-            attached_tool.id not in system_tools
-        ):  # and attached_tool.name != "mcp_search":
-            print("detaching:", attached_tool.name)
-            detach_tasks.append(
-                asyncio.create_task(
-                    client.agents.tools.detach(
-                        agent_id=agent_id, tool_id=attached_tool.id
-                    )
-                )
-            )
-
-    await asyncio.gather(*detach_tasks, return_exceptions=True)
+async def detach_tools(agent_id: str) -> ReconcileReport:
+    return await tool_reconciler.reconcile(agent_id, {})
 
 
 async def add_tool(agent_id: str, mcp_server_name: str, mcp_tool_name: str):
-    tool = await client.tools.add_mcp_tool(
-        mcp_server_name=mcp_server_name,
-        mcp_tool_name=mcp_tool_name,
+    tool_id = await tool_reconciler.register(mcp_server_name, mcp_tool_name)
+    current = await tool_reconciler.attached_tools(agent_id)
+    await tool_reconciler.reconcile(
+        agent_id, {**current, tool_id: mcp_tool_name}
     )
-    await client.agents.tools.attach(agent_id=agent_id, tool_id=tool.id)
 
 
-async def attach_tools(agent_id: str, mcp_server_name: str):
-    available_tools: list[Tool] = await client.tools.list_mcp_tools_by_server(
-        mcp_server_name
+async def server_tools(
+    mcp_server_name: str, report: ReconcileReport = None
+) -> dict[str, str]:
+    """
+    Registered tool ids for every tool an MCP server exposes, as {tool_id: name}.
+    """
+    available_tools: list[Tool] = await mcp_registry.tools(mcp_server_name, report)
+
+    tool_ids = await asyncio.gather(
+        *[
+            tool_reconciler.register(mcp_server_name, available_tool.name, report)
+            for available_tool in available_tools
+        ],
+        return_exceptions=True,
     )
+    return {
+        tool_id: available_tool.name
+        for tool_id, available_tool in zip(tool_ids, available_tools)
+        if not isinstance(tool_id, Exception)
+    }
 
-    attach_tasks = []
-    for available_tool in available_tools:
-        print("adding mcp server tool:", available_tool.name)
-        attach_tasks.append(
-            asyncio.create_task(
-                add_tool(agent_id, mcp_server_name, available_tool.name)
-            )
-        )
 
-    await asyncio.gather(*attach_tasks, return_exceptions=True)
+async def attach_tools(agent_id: str, mcp_server_name: str) -> ReconcileReport:
+    report = ReconcileReport()
+    tools = await server_tools(mcp_server_name, report)
+    current = await tool_reconciler.attached_tools(agent_id, report)
+    return await tool_reconciler.reconcile(agent_id, {**current, **tools}, report)
 
 
-async def add_mcp_server(mcp_server_name: str, mcp_server_url: str):
-    current_mcp_servers = await client.tools.list_mcp_servers()
-    print(current_mcp_servers)
+async def add_mcp_server(
+    mcp_server_name: str, mcp_server_url: str, report: ReconcileReport = None
+):
+    await mcp_registry.ensure_server(mcp_server_name, mcp_server_url, report)
 
-    if mcp_server_name not in current_mcp_servers:
-        print("adding mcp server:", mcp_server_name)
-        response = await client.tools.add_mcp_server(
-            request=SseServerConfig(
-                server_name=mcp_server_name,
-                server_url=mcp_server_url,
-            )
-        )
-        print(response)
 
+@dataclass
+class ToolDiscovery:
+    """
+    Servers found for a query, registered with Letta, and the tools they
+    expose, with timing spans for the search and the registration.
+    """
 
-async def _mcp_search(agent_id: str, query: str, k: int) -> int:
+    mcp_servers: list[str]
+    mcp_server_img_url: str
+    tools: dict[str, str]
+    report: ReconcileReport
+    routing: dict
+    spans: list[dict] = field(default_factory=list)
+
+
+async def route_tools(
+    query: str,
+    servers: list[str],
+    k: int,
+    report: ReconcileReport = None,
+    spread: bool = False,
+) -> tuple[dict[str, str], dict]:
     """
-    Retrieve MCP servers to inject into this agent for a given query.
-    For example, if I want to send an email, I will retrieve the Gmail MCP servers
-    and inject it into this agent ID for you.
+    Pick the `k` tools most relevant to `query` from all of `servers`' tools
+    and register only those. Returns {tool_id: name} and routing metrics.
+    With `spread`, every server gets its best tool before the rest of the
+    budget goes by score, so a task routed to two servers can use both.
+    """
+    index = tool_index()
+    listings = await asyncio.gather(
+        *[mcp_registry.tools(server, report) for server in servers]
+    )
+    for server, tools in zip(servers, listings):
+        await index.index_server(server, tools)
+
+    query_vector = await embedding_service().embed(query)
+    if spread:
+        ranked = index.top_k(query_vector, len(index), servers=servers)
+        best = {}
+        for rank, (payload, _) in enumerate(ranked):
+            best.setdefault(payload["server"], rank)
+        firsts = set(best.values())
+        picked = sorted(firsts)[:k]
+        rest = [rank for rank in range(len(ranked)) if rank not in firsts]
+        hits = [ranked[rank] for rank in sorted(picked + rest[: k - len(picked)])]
+    else:
+        hits = index.top_k(query_vector, k, servers=servers)
+    tool_ids = await asyncio.gather(
+        *[
+            tool_reconciler.register(payload["server"], payload["name"], report)
+            for payload, _ in hits
+        ],
+        return_exceptions=True,
+    )
+    # Tools that failed to register are left out, as in server_tools.
+    registered = [
+        (tool_id, hit)
+        for tool_id, hit in zip(tool_ids, hits)
+        if not isinstance(tool_id, Exception)
+    ]
+    hits = [hit for _, hit in registered]
+
+    available = [p for p in index.payloads if p["server"] in servers]
+    schema_chars = sum(payload["schema_chars"] for payload, _ in hits)
+    schema_chars_all = sum(payload["schema_chars"] for payload in available)
+    routing = {
+        # Servers that contributed a selected tool, best match first.
+        "servers": list(dict.fromkeys(payload["server"] for payload, _ in hits)),
+        "tools_available": len(available),
+        "tools_selected": len(hits),
+        "selected": [f"{p['server']}/{p['name']} ({score:.2f})" for p, score in hits],
+        "schema_chars": schema_chars,
+        "schema_chars_all": schema_chars_all,
+        # About four characters per token.
+        "prompt_tokens": schema_chars // 4,
+        "prompt_tokens_all": schema_chars_all // 4,
+    }
+    return {tool_id: payload["name"] for tool_id, (payload, _) in registered}, routing
+
+
+async def discover_tools(query: str, k: int) -> ToolDiscovery:
+    """
+    Search for the MCP servers matching `query`, make sure they are registered
+    with Letta and fetch their tool ids, without touching any agent.
 
-    agent_id: letta agent id for
-    query: str - prompt query for searching relevant MCP servers
-    k: int - number of MCP servers to return
+    With adaptive routing (ROUTING_ADAPTIVE, the default) the number of
+    servers comes from their search scores (see `ServerRouter`) rather than
+    `k`, and may be zero. Otherwise the top TOOL_ROUTING_SERVERS servers are
+    searched when TOOL_TOP_K is set.
+
+    With TOOL_TOP_K set (the default), only the TOOL_TOP_K most relevant tools
+    across the servers are returned; with TOOL_TOP_K=0 every tool of the
+    servers is.
     """
     # response = requests.get(
     #     url=f"{os.getenv('SEARCH_ENDPOINT')}/search", params={"query": query, "k": k}
@@ -129,30 +208,115 @@ async def _mcp_search(agent_id: str, query: str, k: int) -> int:
 
     # print(response.json())
 
-    response = await search_vectors(query, k)
-    print(response.json())
+    tool_top_k = int(os.getenv("TOOL_TOP_K", 8))
+    if router.enabled:
+        k = max(k, router.max_servers)
+    elif tool_top_k:
+        k = max(k, int(os.getenv("TOOL_ROUTING_SERVERS", 3)))
+
+    spans = []
+    with timed(spans, "vector_search"):
+        response = await search_vectors(query, k)
+        print(response.json())
+
+        mcp_response: McpResponse = McpResponse.from_dict(json.loads(response.json()))
+        candidates = mcp_response.servers
+        decision = None
+        if router.enabled:
+            candidates, decision = await router.choose(query, candidates)
+
+    report = ReconcileReport()
+    with timed(spans, "server_registration"):
+        for server in candidates:
+            await add_mcp_server(server.name, server.url, report)
+        # The old flow listed servers and tools once per server and detached
+        # everything twice per step.
+        report.naive_api_calls += 1 + 2 * len(candidates)
+
+        servers = [server.name for server in candidates]
+        if tool_top_k:
+            desired, routing = await route_tools(
+                query, servers, tool_top_k, report, spread=router.enabled
+            )
+            servers = routing["servers"]
+        else:
+            desired = {}
+            for server in servers:
+                desired.update(await server_tools(server, report))
+            routing = {"tools_available": len(desired), "tools_selected": len(desired)}
+    if decision is not None:
+        routing["decision"] = decision
+
+    images = {server.name: server.image_url for server in mcp_response.servers}
+    return ToolDiscovery(
+        mcp_servers=servers,
+        mcp_server_img_url=images[servers[0]] if servers else "",
+        tools=desired,
+        report=report,
+        routing=routing,
+        spans=spans,
+    )
+
 
-    mcp_response: McpResponse = McpResponse.from_dict(json.loads(response.json()))
+async def _mcp_search(
+    agent_id: str, query: str, k: int, discovery: ToolDiscovery = None
+) -> dict:
+    """
+    Retrieve MCP servers to inject into this agent for a given query.
+    For example, if I want to send an email, I will retrieve the Gmail MCP servers
+    and inject it into this agent ID for you.
 
-    await detach_tools(agent_id)
+    agent_id: letta agent id for
+    query: str - prompt query for searching relevant MCP servers
+    k: int - number of MCP servers to return
+    discovery: ToolDiscovery - result of an earlier `discover_tools(query, k)`,
+        in which case only the agent's tools are updated
+    """
+    if discovery is None:
+        discovery = await discover_tools(query, k)
 
-    mcp_server_img_url = ""
-    for server in mcp_response.servers:
-        await add_mcp_server(server.name, server.url)
-        await attach_tools(agent_id, server.name)
-        mcp_server_img_url = server.image_url
+    # Copy, so a shared prefetched discovery is not counted against twice.
+    report = replace(discovery.report)
+    spans = list(discovery.spans)
+    with timed(spans, "tool_attach"):
+        await tool_reconciler.reconcile(agent_id, discovery.tools, report)
+    print("tool reconcile:", report.to_dict())
 
-    return mcp_server_img_url
+    return {
+        "mcp_server_img_url": discovery.mcp_server_img_url,
+        "mcp_servers": discovery.mcp_servers,
+        "tools": report.to_dict(),
+        "routing": discovery.routing,
+        "spans": spans,
+    }
 
 
 @mcp.tool()
-async def mcp_search(agent_id: str, query: str, k: int) -> int:
+async def mcp_search(agent_id: str, query: str, k: int) -> dict:
     print("agent_id:", agent_id)
     print("query:", query)
     print("k:", k)
-    mcp_server_img_url = await _mcp_search(agent_id, query, k)
+    result = await _mcp_search(agent_id, query, k)
+
+    return {"status": "success", **result}
+
 
-    return {"status": "success", "mcp_server_img_url": mcp_server_img_url}
+@mcp.tool()
+async def mcp_search_batch(queries: list[str], k: int) -> dict:
+    """
+    Find the MCP servers for several task descriptions at once without
+    changing any agent's tools.
+
+    queries: list[str] - task descriptions to search for
+    k: int - number of MCP servers to return per query
+    """
+    results = await search_vectors_batch(
+        [SearchQuery(query=query, k=k) for query in queries]
+    )
+    return {
+        "status": "success",
+        "results": [result.model_dump(mode="json") for result in results],
+    }
 
 
 async def main():
@@ -0,0 +1,120 @@
+import asyncio
+import os
+from typing import Awaitable, Callable
+
+from ..models import WorkflowSession
+
+
+class StepLogSummarizer:
+    """
+    Turns a step's Letta message stream into a few ordered log lines.
+
+    Messages are coalesced into windows that close after `window_ms` of
+    quiet or once `window_size` messages arrive, and each window costs one
+    summary call. A window whose summary comes back after a newer window's
+    summary has already been logged is dropped rather than appended out of
+    order.
+    """
+
+    def __init__(
+        self,
+        session: WorkflowSession,
+        step_id: str,
+        summarize: Callable[[str], Awaitable[str]],
+        window_ms: float | None = None,
+        window_size: int | None = None,
+    ):
+        self.session = session
+        self.step_id = step_id
+        self.summarize = summarize
+        self.window = (
+            window_ms if window_ms is not None else float(os.getenv("LOG_WINDOW_MS", 1500))
+        ) / 1000
+        self.window_size = window_size or int(os.getenv("LOG_WINDOW_SIZE", 8))
+
+        self._buffer: list[str] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._next_seq = 0
+        self._logged_seq = -1
+
+        self.messages = 0
+        self.groq_calls = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def feed(self, message) -> None:
+        self.messages += 1
+        self._buffer.append(str(message))
+        if len(self._buffer) >= self.window_size:
+            self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self.flush)
+
+    def flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._buffer:
+            return
+
+        text = "\n".join(self._buffer)
+        self._buffer = []
+        seq = self._next_seq
+        self._next_seq += 1
+        self._tasks.append(asyncio.create_task(self._summarize_window(seq, text)))
+
+    async def _summarize_window(self, seq: int, text: str) -> None:
+        self.groq_calls += 1
+        try:
+            summary = await self.summarize(text)
+        except Exception as e:
+            print(f"log summary failed: {e}")
+            self.failed += 1
+            return
+
+        if seq < self._logged_seq:
+            self.dropped += 1
+            return
+        self._logged_seq = seq
+        self.session.append_log(summary, step_id=self.step_id)
+
+    async def finish(self, transcript: str) -> str:
+        """
+        Flush the last window, summarize the whole transcript and return that
+        summary once all window summaries have settled.
+        """
+        self.flush()
+        self.groq_calls += 1
+        details, _ = await asyncio.gather(
+            self.summarize(transcript),
+            asyncio.gather(*self._tasks, return_exceptions=True),
+        )
+        self._logged_seq = self._next_seq
+        self.session.append_log(details, step_id=self.step_id)
+        return details
+
+    async def aclose(self) -> None:
+        """
+        Drop the pending window and cancel summaries still in flight, so a
+        step that failed mid-stream stops calling Groq and logging to itself.
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._buffer = []
+        pending = [task for task in self._tasks if not task.done()]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "messages": self.messages,
+            "groq_calls": self.groq_calls,
+            # One call per message plus one for the transcript, as before.
+            "groq_calls_unbatched": self.messages + 1,
+            "windows": self._next_seq,
+            "dropped_stale": self.dropped,
+            "failed": self.failed,
+        }
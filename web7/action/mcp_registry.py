@@ -0,0 +1,107 @@
+import os
+
+from letta_client import SseServerConfig, Tool
+
+from ..cache import SingleFlight, TTLCache
+from ..resources import letta
+from .tool_reconciler import ReconcileReport
+
+_SERVERS = "servers"
+
+
+class McpRegistry:
+    """
+    Process-wide cache of the MCP servers registered with Letta and the tools
+    each one exposes.
+
+    Listings are refreshed after `ttl` seconds, adding a server invalidates
+    what we know about it, and concurrent requests for the same listing or
+    the same server registration share a single Letta call.
+    """
+
+    def __init__(self, ttl: float | None = None):
+        ttl = ttl or float(os.getenv("MCP_REGISTRY_TTL", 300))
+        self._servers = TTLCache(maxsize=1, ttl=ttl)
+        self._tools = TTLCache(maxsize=1024, ttl=ttl)
+        self._flight = SingleFlight()
+        self.api_calls = 0
+
+    def _count(self, report: ReconcileReport = None) -> None:
+        self.api_calls += 1
+        if report is not None:
+            report.api_calls += 1
+
+    async def servers(self, report: ReconcileReport = None) -> set[str]:
+        servers = self._servers.get(_SERVERS)
+        if servers is not None:
+            return servers
+
+        async def fetch() -> set[str]:
+            self._count(report)
+            servers = set(await letta().tools.list_mcp_servers())
+            self._servers.set(_SERVERS, servers)
+            return servers
+
+        return await self._flight.do(("servers",), fetch)
+
+    async def tools(
+        self, mcp_server_name: str, report: ReconcileReport = None
+    ) -> list[Tool]:
+        tools = self._tools.get(mcp_server_name)
+        if tools is not None:
+            return tools
+
+        async def fetch() -> list[Tool]:
+            self._count(report)
+            tools = await letta().tools.list_mcp_tools_by_server(mcp_server_name)
+            self._tools.set(mcp_server_name, tools)
+            return tools
+
+        return await self._flight.do(("tools", mcp_server_name), fetch)
+
+    async def ensure_server(
+        self, mcp_server_name: str, mcp_server_url: str, report: ReconcileReport = None
+    ) -> None:
+        """
+        Register an SSE MCP server with Letta unless it already is.
+        """
+        if mcp_server_name in await self.servers(report):
+            return
+
+        async def add() -> None:
+            print("adding mcp server:", mcp_server_name)
+            self._count(report)
+            response = await letta().tools.add_mcp_server(
+                request=SseServerConfig(
+                    server_name=mcp_server_name,
+                    server_url=mcp_server_url,
+                )
+            )
+            print(response)
+            self.invalidate(mcp_server_name)
+            servers = self._servers.get(_SERVERS)
+            if servers is not None:
+                servers.add(mcp_server_name)
+
+        await self._flight.do(("add", mcp_server_name), add)
+
+    def invalidate(self, mcp_server_name: str | None = None) -> None:
+        """
+        Forget one server's tool listing, or everything when no name is given.
+        """
+        if mcp_server_name is None:
+            self._servers.invalidate()
+            self._tools.invalidate()
+        else:
+            self._tools.invalidate(mcp_server_name)
+
+    def stats(self) -> dict:
+        return {
+            "api_calls": self.api_calls,
+            "servers": self._servers.stats(),
+            "tools": self._tools.stats(),
+            "in_flight": self._flight.stats(),
+        }
+
+
+mcp_registry = McpRegistry()
@@ -0,0 +1,154 @@
+import ast
+import json
+from dataclasses import dataclass, field
+from typing import AsyncIterable, AsyncIterator
+
+
+@dataclass
+class PlannedTask:
+    index: int
+    task: str
+    depends_on: list[int] = field(default_factory=list)
+
+
+def _to_planned_task(index: int, item) -> PlannedTask:
+    if isinstance(item, str):
+        # Bare strings carry no dependency information, so keep the old
+        # strictly sequential behaviour.
+        return PlannedTask(index, item, [index - 1] if index else [])
+
+    if isinstance(item, dict) and isinstance(item.get("task"), str):
+        depends_on = item.get("depends_on") or []
+        if isinstance(depends_on, int):
+            depends_on = [depends_on]
+        # Only earlier tasks may be dependencies, which keeps the plan acyclic.
+        return PlannedTask(
+            index,
+            item["task"],
+            sorted({int(dep) for dep in depends_on if 0 <= int(dep) < index}),
+        )
+
+    raise ValueError(f"unrecognised plan entry: {item!r}")
+
+
+def _loads(text: str):
+    try:
+        return json.loads(text)
+    except ValueError:
+        return ast.literal_eval(text)
+
+
+def parse_plan(text: str) -> list[PlannedTask]:
+    """
+    Parse the planner's output: either a list of task strings or a list of
+    {"task": str, "depends_on": [int]} objects indexing earlier tasks.
+    """
+    items = _loads(text)
+
+    if not isinstance(items, list):
+        raise ValueError(f"expected a list of tasks, got {type(items).__name__}")
+
+    return [_to_planned_task(i, item) for i, item in enumerate(items)]
+
+
+class PlanStreamParser:
+    """
+    Incrementally parses the planner's list output as it streams in.
+
+    `feed` returns the entries of the top-level list completed by the new
+    text: a string entry as soon as its closing quote arrives, an object
+    once its closing brace does. Anything before the opening bracket (such
+    as a code fence) is skipped.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.count = 0
+        self.done = False
+        self._pos = 0
+        self._depth = 0
+        self._quote: str | None = None
+        self._escaped = False
+        self._start: int | None = None
+
+    def feed(self, chunk: str) -> list[PlannedTask]:
+        self.text += chunk
+        tasks = []
+        while self._pos < len(self.text) and not self.done:
+            char = self.text[self._pos]
+            self._pos += 1
+
+            if self._quote is not None:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == self._quote:
+                    self._quote = None
+                    if self._depth == 1:
+                        tasks.append(self._emit())
+                continue
+
+            if self._depth == 0:
+                if char == "[":
+                    self._depth = 1
+                continue
+
+            if char in "\"'":
+                self._quote = char
+            elif char in "[{":
+                self._depth += 1
+            elif char in "]}":
+                self._depth -= 1
+                if self._depth == 0:
+                    self.done = True
+                    continue
+            elif char == "," or char.isspace():
+                continue
+
+            if self._depth == 1 and char in "]}":
+                tasks.append(self._emit())
+            elif self._start is None:
+                self._start = self._pos - 1
+        return tasks
+
+    def _emit(self) -> PlannedTask:
+        item = _loads(self.text[self._start : self._pos])
+        self._start = None
+        task = _to_planned_task(self.count, item)
+        self.count += 1
+        return task
+
+
+async def stream_plan(
+    chunks: AsyncIterable[str], parser: PlanStreamParser | None = None
+) -> AsyncIterator[PlannedTask]:
+    """
+    Yield planned tasks from streamed planner output as each one completes.
+
+    If the stream cannot be parsed incrementally, the whole text is parsed
+    once it has arrived and only the tasks not already yielded are returned.
+    Output that stops before the closing bracket keeps the tasks it has.
+    Pass a `parser` to check afterwards whether the plan was complete: its
+    `done` is set once the closing bracket was seen or the full text parsed.
+    """
+    parser = parser or PlanStreamParser()
+    failed = False
+    async for chunk in chunks:
+        if failed:
+            parser.text += chunk
+            continue
+        try:
+            for task in parser.feed(chunk):
+                yield task
+        except (ValueError, SyntaxError) as e:
+            print(f"incremental plan parse failed, waiting for full output: {e}")
+            failed = True
+
+    if failed or not parser.count:
+        tasks = parse_plan(parser.text)
+        parser.done = True
+        for task in tasks[parser.count :]:
+            yield task
+    elif not parser.done:
+        print(f"plan output ended early, keeping {parser.count} tasks")
@@ -0,0 +1,266 @@
+import asyncio
+import os
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+import orjson
+
+from ..llm.groq import groq_complete
+from ..resources import embedding_service, groq, groq_limiter
+from .plan import PlannedTask, parse_plan
+
+REFILL_PROMPT = """
+You adapt a task plan written for one request to a new, near-identical request.
+Keep the number and order of tasks the same and change only the names, people,
+places, dates and other specifics so they match the new request.
+Output a JSON list of task strings and nothing else.
+"""
+
+
+@dataclass
+class CachedPlan:
+    query: str
+    vector: list[float]
+    tasks: list[dict]
+    created_at: float = field(default_factory=time.time)
+    hits: int = 0
+
+    def planned_tasks(self) -> list[PlannedTask]:
+        return [
+            PlannedTask(i, task["task"], list(task["depends_on"]))
+            for i, task in enumerate(self.tasks)
+        ]
+
+
+class PlanCache:
+    """
+    Reuses earlier plans for queries whose embedding is within `threshold`
+    cosine similarity of a cached query.
+
+    Entries are evicted least recently used past `maxsize` and expire after
+    `ttl` seconds. The cache lives in memory only unless PLAN_CACHE_PATH is
+    set, since it holds raw queries and plans; with a `path` it is saved
+    after every change and loaded from it on first use. A match that is not textually identical to the
+    query is only used with `refill` set, which rewrites its task specifics
+    with one Groq call; without refill, or when the refill fails, it counts
+    as a miss so one query's names and details are never replayed for another.
+    """
+
+    def __init__(
+        self,
+        threshold: float | None = None,
+        maxsize: int | None = None,
+        ttl: float | None = None,
+        path: str | None = None,
+        refill: bool | None = None,
+    ):
+        self.threshold = threshold or float(os.getenv("PLAN_CACHE_THRESHOLD", 0.92))
+        self.maxsize = maxsize or int(os.getenv("PLAN_CACHE_SIZE", 256))
+        self.ttl = ttl or float(os.getenv("PLAN_CACHE_TTL", 7 * 24 * 3600))
+        self.path = path if path is not None else os.getenv(
+            "PLAN_CACHE_PATH", ""
+        )
+        self.refill = (
+            refill if refill is not None else bool(os.getenv("PLAN_CACHE_REFILL"))
+        )
+
+        # Insertion order doubles as recency order, oldest first.
+        self._entries: list[CachedPlan] = []
+        self._matrix: np.ndarray | None = None
+        self._loaded = False
+        self._save_lock = asyncio.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.refills = 0
+        self.refill_failures = 0
+        self.near_misses = 0
+        self.plan_seconds = 0.0
+        self.planned = 0
+        self.saved_seconds = 0.0
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return " ".join(text.lower().split())
+
+    def load(self) -> None:
+        self._loaded = True
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "rb") as f:
+                entries = [CachedPlan(**entry) for entry in orjson.loads(f.read())]
+        except (OSError, ValueError, TypeError) as e:
+            print(f"ignoring unreadable plan cache {self.path}: {e}")
+            return
+        self._entries = [entry for entry in entries if not self._expired(entry)]
+        self._matrix = None
+
+    def save(self, entries: list[CachedPlan] | None = None) -> None:
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(orjson.dumps(self._entries if entries is None else entries))
+        os.replace(tmp_path, self.path)
+
+    async def _save(self) -> None:
+        # Saves share a temporary file, so write one at a time, from a copy
+        # of the entry list taken on the event loop.
+        if not self.path:
+            return
+        async with self._save_lock:
+            await asyncio.to_thread(self.save, list(self._entries))
+
+    def _expired(self, entry: CachedPlan) -> bool:
+        return time.time() - entry.created_at > self.ttl
+
+    def _unit_matrix(self) -> np.ndarray:
+        if self._matrix is None:
+            matrix = np.asarray([entry.vector for entry in self._entries], dtype=np.float32)
+            if len(matrix):
+                matrix /= np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-12
+            self._matrix = matrix
+        return self._matrix
+
+    async def _embed(self, query: str) -> np.ndarray:
+        vector = np.asarray(await embedding_service().embed(query), dtype=np.float32)
+        return vector / (np.linalg.norm(vector) + 1e-12)
+
+    async def lookup(self, query: str) -> list[PlannedTask] | None:
+        """
+        Return the cached plan for the most similar query above the
+        threshold, or None on a miss. Plans for other wording are only
+        returned refilled for `query`.
+        """
+        if not self._loaded:
+            self.load()
+
+        start = time.perf_counter()
+        vector = await self._embed(query)
+        matrix = self._unit_matrix()
+        best = None
+        if len(matrix):
+            scores = matrix @ vector
+            for i in np.argsort(-scores):
+                if scores[i] < self.threshold:
+                    break
+                if not self._expired(self._entries[i]):
+                    best = int(i)
+                    break
+
+        if best is None:
+            self.misses += 1
+            return None
+
+        entry = self._entries[best]
+        tasks = entry.planned_tasks()
+        if self.normalize(entry.query) != self.normalize(query):
+            if self.refill:
+                tasks = await self._refill(entry, query, tasks)
+            else:
+                tasks = None
+            if tasks is None:
+                self.near_misses += 1
+                self.misses += 1
+                return None
+
+        # The refill awaited, so the entry may have moved or been evicted.
+        if entry in self._entries:
+            self._entries.remove(entry)
+            self._entries.append(entry)
+            self._matrix = None
+        entry.hits += 1
+        self.hits += 1
+
+        if self.planned:
+            self.saved_seconds += max(
+                self.plan_seconds / self.planned - (time.perf_counter() - start), 0.0
+            )
+        print(f"plan cache hit for {query!r}: reusing plan for {entry.query!r}")
+        return tasks
+
+    async def _refill(
+        self, entry: CachedPlan, query: str, tasks: list[PlannedTask]
+    ) -> list[PlannedTask] | None:
+        user_prompt = f"""
+        Original request: {entry.query}
+        Original tasks: {orjson.dumps([task.task for task in tasks]).decode()}
+        New request: {query}
+        """
+        try:
+            text = await groq_complete(groq(), REFILL_PROMPT, user_prompt, groq_limiter())
+            refilled = parse_plan(text)
+        except Exception as e:
+            print(f"plan refill failed: {e}")
+            self.refill_failures += 1
+            return None
+
+        if len(refilled) != len(tasks):
+            self.refill_failures += 1
+            return None
+        self.refills += 1
+        return [
+            PlannedTask(task.index, new.task, task.depends_on)
+            for task, new in zip(tasks, refilled)
+        ]
+
+    async def store(
+        self, query: str, tasks: list[PlannedTask], plan_seconds: float | None = None
+    ) -> None:
+        """
+        Cache the plan produced for `query`; `plan_seconds` is how long
+        planning took, which is what a later hit saves.
+        """
+        if plan_seconds is not None:
+            self.plan_seconds += plan_seconds
+            self.planned += 1
+        if not tasks:
+            return
+
+        vector = await self._embed(query)
+        if not self._loaded:
+            self.load()
+        key = self.normalize(query)
+        self._entries = [
+            entry
+            for entry in self._entries
+            if self.normalize(entry.query) != key and not self._expired(entry)
+        ]
+        self._entries.append(
+            CachedPlan(
+                query=query,
+                vector=vector.tolist(),
+                tasks=[
+                    {"task": task.task, "depends_on": task.depends_on}
+                    for task in tasks
+                ],
+            )
+        )
+        del self._entries[: -self.maxsize]
+        self._matrix = None
+        await self._save()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "refills": self.refills,
+            "refill_failures": self.refill_failures,
+            # Matches above the threshold rejected because they could not
+            # be refilled for the new wording.
+            "near_misses": self.near_misses,
+            "mean_plan_s": round(self.plan_seconds / self.planned, 3)
+            if self.planned
+            else None,
+            "saved_s": round(self.saved_seconds, 3),
+        }
+
+
+plan_cache = PlanCache()
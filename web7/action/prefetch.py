@@ -0,0 +1,76 @@
+import asyncio
+import time
+
+from .interface_search import ToolDiscovery, discover_tools
+
+
+class ToolPrefetcher:
+    """
+    Per-workflow table of speculative tool discoveries.
+
+    As soon as a step is planned its server search, MCP server registration
+    and tool listing start in the background, so when the step begins only
+    attaching the tools to its agent is left. A discovery that failed is
+    retried on demand; `cancel` drops whatever is still running.
+    """
+
+    def __init__(self, k: int = 1):
+        self.k = k
+        self._table: dict[str, tuple[str, asyncio.Task]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.failed = 0
+        self.waited = 0.0
+
+    def prefetch(self, key: str, query: str) -> None:
+        if key not in self._table:
+            task = asyncio.create_task(discover_tools(query, self.k))
+            # Failures surface in `take`; one that is never taken is dropped.
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._table[key] = (query, task)
+
+    async def take(self, key: str, query: str) -> tuple[ToolDiscovery, dict]:
+        """
+        Return the discovery for `key`, waiting on the prefetch if it is still
+        running, plus metrics on how much of it was already done.
+        """
+        start = time.perf_counter()
+        entry = self._table.pop(key, None)
+        discovery = None
+        outcome = "miss"
+        if entry is not None and entry[0] == query:
+            outcome = "ready" if entry[1].done() else "waited"
+            try:
+                discovery = await entry[1]
+                self.hits += 1
+            except Exception as e:
+                print(f"tool prefetch for {key} failed: {e}")
+                self.failed += 1
+                outcome = "failed"
+        elif entry is not None:
+            entry[1].cancel()
+
+        if discovery is None:
+            self.misses += 1
+            discovery = await discover_tools(query, self.k)
+
+        waited = time.perf_counter() - start
+        self.waited += waited
+        return discovery, {
+            "prefetch": outcome,
+            "discovery_wait_ms": round(waited * 1000, 1),
+        }
+
+    def cancel(self) -> None:
+        for _, task in self._table.values():
+            task.cancel()
+        self._table.clear()
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._table),
+            "hits": self.hits,
+            "misses": self.misses,
+            "failed": self.failed,
+            "waited_s": round(self.waited, 3),
+        }
@@ -0,0 +1,174 @@
+import os
+import time
+from collections import Counter
+
+import numpy as np
+import orjson
+
+from ..resources import embedding_service
+from ..search.lexical_index import compact
+
+# What the agent's built-in tools (see `system_tools`) cover without any MCP
+# server attached.
+BUILTIN_TASKS = {
+    "web_search": "search the web and look up information, news or facts online",
+    "run_code": "run code to calculate, analyse, convert or transform data",
+    "memory": "answer, explain, summarize, rewrite or draft text from what is known",
+}
+
+
+def names_server(query: str, name: str) -> bool:
+    """
+    Whether `query` mentions the server by name, ignoring case, spaces and
+    punctuation.
+    """
+    name = compact(name)
+    return len(name) >= 3 and name in compact(query)
+
+
+class ServerRouter:
+    """
+    Chooses how many of the searched MCP servers a step gets from their
+    scores instead of a fixed k.
+
+    Candidates are ranked by their score, since hybrid search returns them
+    in fused order. Servers the query names are always kept, whatever their
+    score. Otherwise the best server is kept if it scores at least
+    `min_score`. Each next one is kept while it also clears `min_score` and
+    is within `max_gap` of the server before it, up to `max_servers`. No
+    server is attached when none is named and none clears `min_score`, or
+    when a built-in tool matches the task better than the best server by
+    `builtin_margin`.
+
+    With ROUTING_LOG set, every decision is appended to that JSONL file with
+    the step's outcome. The records include the query and task text, so the
+    log is off by default.
+    """
+
+    def __init__(
+        self,
+        min_score: float | None = None,
+        max_gap: float | None = None,
+        max_servers: int | None = None,
+        builtin_margin: float | None = None,
+        log_path: str | None = None,
+    ):
+        self.enabled = os.getenv("ROUTING_ADAPTIVE", "1") != "0"
+        self.min_score = (
+            min_score
+            if min_score is not None
+            else float(os.getenv("ROUTING_MIN_SCORE", 0.25))
+        )
+        self.max_gap = (
+            max_gap if max_gap is not None else float(os.getenv("ROUTING_MAX_GAP", 0.1))
+        )
+        self.max_servers = max_servers or int(os.getenv("ROUTING_MAX_SERVERS", 3))
+        self.builtin_margin = (
+            builtin_margin
+            if builtin_margin is not None
+            else float(os.getenv("ROUTING_BUILTIN_MARGIN", 0.05))
+        )
+        self.log_path = log_path if log_path is not None else os.getenv(
+            "ROUTING_LOG", ""
+        )
+
+        self._builtin_matrix: np.ndarray | None = None
+        self.decisions = 0
+        self.reasons: Counter = Counter()
+        self.servers_chosen: Counter = Counter()
+
+    async def builtin_match(self, query_vector) -> tuple[str, float]:
+        """
+        The built-in tool closest to the query and its cosine similarity.
+        """
+        if self._builtin_matrix is None:
+            vectors = await embedding_service().embed_many(list(BUILTIN_TASKS.values()))
+            matrix = np.asarray(vectors, dtype=np.float32).reshape(len(BUILTIN_TASKS), -1)
+            self._builtin_matrix = matrix / (
+                np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-12
+            )
+        query = np.asarray(query_vector, dtype=np.float32)
+        scores = self._builtin_matrix @ (query / (np.linalg.norm(query) + 1e-12))
+        best = int(np.argmax(scores))
+        return list(BUILTIN_TASKS)[best], float(scores[best])
+
+    async def choose(self, query: str, servers: list) -> tuple[list, dict]:
+        """
+        The servers to attach for `query` out of `servers` (search hits, best
+        first, each with a `score`), and the decision behind it.
+        """
+        decision = {
+            "candidates": [
+                [server.name, None if server.score is None else round(server.score, 3)]
+                for server in servers
+            ]
+        }
+        if any(server.score is None for server in servers):
+            # The backend did not report scores; fall back to a fixed k.
+            return self._decide(decision, servers[:1], "unscored")
+
+        servers = sorted(servers, key=lambda server: -server.score)
+        chosen = [server for server in servers if names_server(query, server.name)]
+        chosen = chosen[: self.max_servers]
+        rest = [server for server in servers if server not in chosen]
+        if chosen:
+            decision["named"] = [server.name for server in chosen]
+        elif not servers or servers[0].score < self.min_score:
+            return self._decide(decision, [], "below_threshold")
+        else:
+            builtin, builtin_score = await self.builtin_match(
+                await embedding_service().embed(query)
+            )
+            decision["builtin"] = [builtin, round(builtin_score, 3)]
+            if builtin_score > servers[0].score + self.builtin_margin:
+                return self._decide(decision, [], "builtin")
+            chosen, rest = servers[:1], servers[1:]
+
+        reason = "exhausted"
+        previous = max(server.score for server in chosen)
+        for server in rest:
+            if len(chosen) >= self.max_servers:
+                reason = "budget"
+                break
+            if server.score < self.min_score:
+                reason = "threshold"
+                break
+            if previous - server.score > self.max_gap:
+                reason = "gap"
+                break
+            chosen.append(server)
+            previous = server.score
+        return self._decide(decision, chosen, reason)
+
+    def _decide(self, decision: dict, chosen: list, reason: str) -> tuple[list, dict]:
+        decision.update(
+            k=len(chosen), chosen=[server.name for server in chosen], reason=reason
+        )
+        self.decisions += 1
+        self.reasons[reason] += 1
+        self.servers_chosen[len(chosen)] += 1
+        return chosen, decision
+
+    def log(self, record: dict) -> None:
+        if not self.log_path:
+            return
+        try:
+            with open(self.log_path, "ab") as file:
+                file.write(orjson.dumps({"ts": time.time(), **record}) + b"\n")
+        except OSError as e:
+            print(f"Failed to write routing log {self.log_path}: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "decisions": self.decisions,
+            "reasons": dict(self.reasons),
+            "servers_chosen": {str(k): n for k, n in sorted(self.servers_chosen.items())},
+            "min_score": self.min_score,
+            "max_gap": self.max_gap,
+            "max_servers": self.max_servers,
+            "log": self.log_path or None,
+        }
+
+
+router = ServerRouter()
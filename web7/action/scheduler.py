@@ -0,0 +1,128 @@
+import asyncio
+import os
+from typing import AsyncIterable, Awaitable, Callable, Iterable
+
+from .agent_pool import AgentPool
+from .plan import PlannedTask
+
+
+class AgentLanes:
+    """
+    Hands out one Letta agent per concurrently running step so that parallel
+    branches never share a tool set or message history. The workflow's own
+    agent is always the first lane; extra agents are taken from the agent
+    pool on demand, reused once free and handed back when the workflow ends.
+    """
+
+    def __init__(self, primary_agent_id: str, pool: AgentPool):
+        self.primary_agent_id = primary_agent_id
+        self.pool = pool
+        self.free = [primary_agent_id]
+        self.created: list[str] = []
+
+    async def acquire(self) -> str:
+        if self.free:
+            return self.free.pop(0)
+        agent_id = await self.pool.acquire()
+        self.created.append(agent_id)
+        return agent_id
+
+    def release(self, agent_id: str) -> None:
+        # Prefer the primary agent so sequential stretches stay on it.
+        if agent_id == self.primary_agent_id:
+            self.free.insert(0, agent_id)
+        else:
+            self.free.append(agent_id)
+
+    async def close(self) -> None:
+        await asyncio.gather(
+            *[self.pool.release(agent_id) for agent_id in self.created],
+            return_exceptions=True,
+        )
+        self.created = []
+
+
+class DagScheduler:
+    """
+    Runs planned tasks as soon as all of their dependencies have finished,
+    with at most `concurrency` tasks in flight.
+    """
+
+    def __init__(self, concurrency: int | None = None):
+        self.concurrency = concurrency or int(os.getenv("WORKFLOW_CONCURRENCY", 3))
+
+    async def run(
+        self,
+        tasks: Iterable[PlannedTask] | AsyncIterable[PlannedTask],
+        run_task: Callable[[PlannedTask, dict[int, str]], Awaitable[str]],
+    ) -> dict[int, str]:
+        """
+        Call `run_task(task, results)` for every task, where `results` maps the
+        index of each finished task to its result. Returns that mapping.
+
+        `tasks` may be an async iterable, in which case tasks are scheduled as
+        they arrive while the rest of the plan is still being produced.
+        """
+        if isinstance(tasks, AsyncIterable):
+            incoming = aiter(tasks)
+            pending: dict[int, PlannedTask] = {}
+        else:
+            incoming = None
+            pending = {task.index: task for task in tasks}
+        next_task: asyncio.Task | None = None
+        results: dict[int, str] = {}
+        running: dict[asyncio.Task, PlannedTask] = {}
+
+        try:
+            while True:
+                if incoming is not None and next_task is None:
+                    next_task = asyncio.ensure_future(anext(incoming))
+
+                ready = [
+                    task
+                    for task in pending.values()
+                    if all(dep in results for dep in task.depends_on)
+                ]
+                for task in ready[: self.concurrency - len(running)]:
+                    del pending[task.index]
+                    running[asyncio.create_task(run_task(task, results))] = task
+
+                if not running and next_task is None:
+                    if pending:
+                        raise ValueError(
+                            f"unsatisfiable dependencies for tasks {sorted(pending)}"
+                        )
+                    break
+
+                waiting = set(running)
+                if next_task is not None:
+                    waiting.add(next_task)
+                done, _ = await asyncio.wait(
+                    waiting, return_when=asyncio.FIRST_COMPLETED
+                )
+
+                if next_task in done:
+                    finished, next_task = next_task, None
+                    try:
+                        task = finished.result()
+                    except StopAsyncIteration:
+                        incoming = None
+                    else:
+                        pending[task.index] = task
+                    done.discard(finished)
+
+                for finished in done:
+                    task = running.pop(finished)
+                    results[task.index] = finished.result()
+        finally:
+            if next_task is not None:
+                next_task.cancel()
+            for task in running:
+                task.cancel()
+            await asyncio.gather(
+                *running, *([next_task] if next_task else []), return_exceptions=True
+            )
+            if incoming is not None and hasattr(incoming, "aclose"):
+                await incoming.aclose()
+
+        return results
@@ -0,0 +1,141 @@
+import asyncio
+from dataclasses import dataclass, asdict
+from typing import Iterable
+
+from ..resources import letta
+
+
+@dataclass
+class ReconcileReport:
+    kept: int = 0
+    attached: int = 0
+    detached: int = 0
+    registered: int = 0
+    api_calls: int = 0
+    # What the old detach-all / list / add + attach-all flow would have cost.
+    naive_api_calls: int = 0
+
+    @property
+    def api_calls_saved(self) -> int:
+        return self.naive_api_calls - self.api_calls
+
+    def to_dict(self) -> dict:
+        return {**asdict(self), "api_calls_saved": self.api_calls_saved}
+
+
+class ToolReconciler:
+    """
+    Brings an agent's attached tools to a desired set by attaching and
+    detaching only the difference.
+
+    The attached set of each agent is cached after the first listing, since
+    only this process changes it, and `add_mcp_tool` results are cached per
+    (server, tool) so a tool is registered with Letta once.
+    """
+
+    def __init__(self, protected: Iterable[str] = ()):
+        self.protected = set(protected)
+        self._attached: dict[str, dict[str, str]] = {}
+        self._registered: dict[tuple[str, str], str] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+        self.api_calls = 0
+        self.api_calls_saved = 0
+
+    def _lock(self, agent_id: str) -> asyncio.Lock:
+        if agent_id not in self._locks:
+            self._locks[agent_id] = asyncio.Lock()
+        return self._locks[agent_id]
+
+    async def attached_tools(self, agent_id: str, report: ReconcileReport = None) -> dict[str, str]:
+        """
+        Non-protected tools attached to `agent_id`, as {tool_id: name}.
+        """
+        if agent_id not in self._attached:
+            tools = await letta().agents.tools.list(agent_id=agent_id)
+            if report is not None:
+                report.api_calls += 1
+            self._attached[agent_id] = {
+                tool.id: tool.name for tool in tools if tool.id not in self.protected
+            }
+        return dict(self._attached[agent_id])
+
+    async def register(
+        self, mcp_server_name: str, mcp_tool_name: str, report: ReconcileReport = None
+    ) -> str:
+        """
+        Tool id for an MCP tool, registering it with Letta the first time.
+        """
+        key = (mcp_server_name, mcp_tool_name)
+        if key not in self._registered:
+            tool = await letta().tools.add_mcp_tool(
+                mcp_server_name=mcp_server_name,
+                mcp_tool_name=mcp_tool_name,
+            )
+            if report is not None:
+                report.api_calls += 1
+                report.registered += 1
+            self._registered[key] = tool.id
+        return self._registered[key]
+
+    async def reconcile(
+        self,
+        agent_id: str,
+        desired: dict[str, str],
+        report: ReconcileReport = None,
+    ) -> ReconcileReport:
+        """
+        Attach and detach tools so `agent_id` has exactly `desired`
+        ({tool_id: name}) on top of the protected system tools.
+        """
+        report = report or ReconcileReport()
+        client = letta()
+
+        async with self._lock(agent_id):
+            current = await self.attached_tools(agent_id, report)
+            to_detach = [tool_id for tool_id in current if tool_id not in desired]
+            to_attach = [tool_id for tool_id in desired if tool_id not in current]
+
+            for tool_id in to_detach:
+                print("detaching:", current[tool_id])
+            for tool_id in to_attach:
+                print("attaching:", desired[tool_id])
+
+            results = await asyncio.gather(
+                *[
+                    client.agents.tools.detach(agent_id=agent_id, tool_id=tool_id)
+                    for tool_id in to_detach
+                ],
+                *[
+                    client.agents.tools.attach(agent_id=agent_id, tool_id=tool_id)
+                    for tool_id in to_attach
+                ],
+                return_exceptions=True,
+            )
+            report.api_calls += len(results)
+            report.kept += len(current) - len(to_detach)
+            report.detached += len(to_detach)
+            report.attached += len(to_attach)
+            report.naive_api_calls += 1 + len(current) + 2 * len(desired)
+
+            if any(isinstance(result, Exception) for result in results):
+                # We no longer know the agent's real state; re-list next time.
+                print("tool reconcile failed for", agent_id, results)
+                self._attached.pop(agent_id, None)
+            else:
+                self._attached[agent_id] = dict(desired)
+
+        self.api_calls += report.api_calls
+        self.api_calls_saved += report.api_calls_saved
+        return report
+
+    def forget(self, agent_id: str) -> None:
+        self._attached.pop(agent_id, None)
+        self._locks.pop(agent_id, None)
+
+    def stats(self) -> dict:
+        return {
+            "agents_tracked": len(self._attached),
+            "registered_tools": len(self._registered),
+            "api_calls": self.api_calls,
+            "api_calls_saved": self.api_calls_saved,
+        }
@@ -1,12 +1,11 @@
 from dotenv import load_dotenv
 import json
 
-from ..llm.groq import groq_complete, init_groq
+from ..llm.groq import groq_complete
+from ..resources import groq
 
 load_dotenv()
 
-groq_client = init_groq()
-
 system_prompt = """
 You are a highly analytical evaluation agent. Your job is to verify whether a given output satisfies the requirements of a specified task. You must evaluate strictly and objectively based on the task description, not based on assumptions or missing context.
 
@@ -31,7 +30,7 @@ Be concise but precise. Do not include any additional text outside of the JSON o
 
 def verify(task_descriptor: str, llm_response: str):
     user_prompt = f"TASK DESCRIPTOR: {task_descriptor}. OUTPUT: {llm_response}"
-    return json.loads(groq_complete(groq_client, system_prompt, user_prompt))
+    return json.loads(groq_complete(groq(), system_prompt, user_prompt))
 
 
 if __name__ == "__main__":
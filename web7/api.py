@@ -1,5 +1,13 @@
-from fastapi import FastAPI, HTTPException, Query, BackgroundTasks
-from fastapi.responses import RedirectResponse, HTMLResponse
+from fastapi import (
+    FastAPI,
+    HTTPException,
+    Query,
+    BackgroundTasks,
+    Header,
+    WebSocket,
+    WebSocketDisconnect,
+)
+from fastapi.responses import RedirectResponse, HTMLResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from typing import List, Dict, Any, Optional
 import uvicorn
@@ -8,8 +16,11 @@ from enum import Enum
 from dotenv import load_dotenv
 from dataclasses import dataclass
 from typing import Self
-from .search.qdrant_vector_search.qdrant_client import QdrantVectorDb
+from contextlib import asynccontextmanager
+from . import resources
 from .models import (
+    BatchSearchRequest,
+    BatchSearchResponse,
     SearchQuery,
     SearchResponse,
     UserQueryRequest,
@@ -19,21 +30,53 @@ from .models import (
     Step,
     StepStatus,
 )
-from .search.vector_service import search_vectors
+from .sessions import SessionStore, create_session_store
+from .search.vector_service import (
+    search_stats,
+    search_vectors,
+    search_vectors_batch,
+    sync_catalog,
+)
 from datetime import datetime
 import uuid
 import asyncio
+import json
 import time
-from letta_client import LlmConfig, AsyncLetta, StreamableHttpServerConfig
-from web7.action.agent import generate_task_list, accomplish_task
+from letta_client import LlmConfig, StreamableHttpServerConfig
+from web7.action.agent import accomplish_task, stream_task_list
+from web7.action.agent_pool import agent_pool
+from web7.action.fast_path import fast_planner
+from web7.action.interface_search import tool_reconciler
+from web7.action.mcp_registry import mcp_registry
+from web7.action.plan import PlannedTask
+from web7.action.plan_cache import plan_cache
+from web7.action.prefetch import ToolPrefetcher
+from web7.action.routing import router
+from web7.action.scheduler import AgentLanes, DagScheduler
+from web7.timing import Stopwatch, phase_timings
 
 load_dotenv()
 
-client = AsyncLetta(token=os.getenv("LETTA_API_KEY"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Clients and the embedding model are created lazily on first use; set
+    # WEB7_WARMUP=1 to build them before the server accepts requests.
+    if os.getenv("WEB7_WARMUP"):
+        await resources.warm_up()
+    agent_pool.start()
+    resources.registry.ready_at = time.perf_counter()
+    print("startup:", resources.startup_report())
+    yield
+    await agent_pool.close()
+    await resources.shutdown()
+
+
 app = FastAPI(
     title="Web7 Vector Search API",
     description="API for MCP server search",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 origins = ["http://localhost:3000", "http://localhost:3001"]
@@ -46,38 +89,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-workflow_sessions: Dict[str, WorkflowSession] = {}
+session_store: SessionStore = create_session_store()
 
 
 async def init_letta():
-    await client.tools.add_mcp_server(
+    await resources.letta().tools.add_mcp_server(
         request=StreamableHttpServerConfig(
             server_name="search", server_url=os.getenv("SEARCH_MCP_ENDPOINT")
         )
     )
 
 
-async def create_agent():
-    # search_tool = await client.tools.add_mcp_tool("search", "mcp_search")
-    agent = await client.agents.create(
-        model="anthropic/claude-sonnet-4-20250514",
-        embedding="openai/text-embedding-3-small",
-        memory_blocks=[
-            {"label": "human", "value": ""},
-            {
-                "label": "persona",
-                "value": (
-                    "I am an AI assistant agent tailored towards executing"
-                    "workflows using tools to accomplish the user's task."
-                ),
-            },
-        ],
-    )
-    # await client.agents.tools.attach(agent.id, search_tool.id)
-
-    return agent.id
-
-
 @app.post("/user-query")
 async def submit_query(request: UserQueryRequest, background_tasks: BackgroundTasks):
     """Submit query and start processing in background"""
@@ -87,12 +109,12 @@ async def submit_query(request: UserQueryRequest, background_tasks: BackgroundTa
     #     "status": 0,
     # }
 
-    agent_id = await create_agent()
+    agent_id = await agent_pool.acquire()
     # agent_id = "agent-4d880512-8969-4ef3-9b18-a42bddb4dd16"
     session = WorkflowSession(agent_id, request.query)
-    workflow_sessions[agent_id] = session
+    session_store.put(session)
 
-    background_tasks.add_task(process_workflow, agent_id)
+    background_tasks.add_task(process_workflow, agent_id, owns_agent=True)
 
     return {
         "agent_id": agent_id,
@@ -106,9 +128,9 @@ async def submit_query_with_id(
 ):
     """Submit query and start processing in background"""
     session = WorkflowSession(request.agent_id, request.query)
-    workflow_sessions[request.agent_id] = session
+    session_store.put(session)
 
-    background_tasks.add_task(process_workflow, request.agent_id, request.query)
+    background_tasks.add_task(process_workflow, request.agent_id)
 
     return {
         "agent_id": request.agent_id,
@@ -124,52 +146,170 @@ async def get_workflow_status(agent_id: str):
     # return session.to_dict()
 
     """Get current workflow status - Frontend polls this endpoint"""
-    if agent_id not in workflow_sessions:
+    session = session_store.get(agent_id)
+    if session is None:
         raise HTTPException(status_code=404, detail="Agent not found")
-
-    session = workflow_sessions[agent_id]
     return session.to_dict()
 
 
-async def process_workflow(agent_id: str):
-    """Main workflow processing logic - customize this for your LLM"""
-    session = workflow_sessions[agent_id]
+async def session_events(session: WorkflowSession, last_event_id: int = 0):
+    """
+    Yield the session's events after `last_event_id` as they happen, until the
+    workflow finishes. Yields None when nothing happened for a while so
+    callers can send a keep-alive.
+    """
+    if not session_store.is_live(session.agent_id):
+        # Another worker owns this workflow; follow it through the shared
+        # store with snapshots instead of individual events.
+        updated_at = None
+        while True:
+            if session.updated_at != updated_at:
+                updated_at = session.updated_at
+                yield {"id": last_event_id, "type": "snapshot", "data": session.to_dict()}
+            if session.is_finished:
+                return
+            await asyncio.sleep(1)
+            session = session_store.get(session.agent_id) or session
+
+    if session.events.missed(last_event_id):
+        # The client is further behind than the retained log; resync it.
+        last_event_id = session.events.seq
+        yield {"id": last_event_id, "type": "snapshot", "data": session.to_dict()}
+
+    while True:
+        events = await session.events.wait(last_event_id, timeout=15)
+        for event in events:
+            last_event_id = event["id"]
+            yield event
+        if session.events.closed and not session.events.since(last_event_id):
+            return
+        if not events:
+            yield None
+
+
+@app.get("/workflow/{agent_id}/events")
+async def stream_workflow_events(
+    agent_id: str,
+    last_event_id: int = Query(default=0, ge=0),
+    last_event_id_header: Optional[str] = Header(default=None, alias="Last-Event-ID"),
+):
+    """Server-sent events for a workflow; resumes after Last-Event-ID"""
+    session = session_store.get(agent_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Agent not found")
+    if last_event_id_header and last_event_id_header.isdigit():
+        last_event_id = int(last_event_id_header)
+
+    async def event_stream():
+        async for event in session_events(session, last_event_id):
+            if event is None:
+                yield ": keep-alive\n\n"
+                continue
+            data = json.dumps(event["data"], default=str)
+            yield f"id: {event['id']}\nevent: {event['type']}\ndata: {data}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-    try:
-        session.status = WorkflowStatus.IN_PROGRESS
 
-        # Define your workflow steps
-        workflow_steps: list[str] = await generate_task_list(
-            session.agent_id, session.query
-        )
+@app.websocket("/workflow/{agent_id}/ws")
+async def workflow_websocket(websocket: WebSocket, agent_id: str, last_event_id: int = 0):
+    """WebSocket variant of /workflow/{agent_id}/events"""
+    await websocket.accept()
+    session = session_store.get(agent_id)
+    if session is None:
+        await websocket.close(code=4404, reason="Agent not found")
+        return
 
-        print("workflow steps:", workflow_steps)
-        for step in workflow_steps:
-            session.add_step(action=step)
+    try:
+        async for event in session_events(session, last_event_id):
+            if event is not None:
+                await websocket.send_text(json.dumps(event, default=str))
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
 
-        print(session.steps)
 
-        total_steps = len(workflow_steps)
+async def process_workflow(agent_id: str, owns_agent: bool = False):
+    """Main workflow processing logic - customize this for your LLM"""
+    session = session_store.get(agent_id)
+    lanes = AgentLanes(session.agent_id, agent_pool)
+    prefetcher = ToolPrefetcher()
+
+    async def run_step(task: PlannedTask, results: dict[int, str]) -> str:
+        step = session.steps[task.index]
+        lane_agent_id = await lanes.acquire()
+        session.start_step(step.step_id)
+        watch = Stopwatch()
+        try:
+            context = "\n\n".join(
+                f"{session.steps[dep].action}: {results[dep]}"
+                for dep in task.depends_on
+            )
+            result = await accomplish_task(
+                session,
+                task.task,
+                task.index + 1,
+                agent_id=lane_agent_id,
+                context=context,
+                prefetcher=prefetcher,
+            )
+        except Exception as e:
+            step_span = watch.span("step")
+            session.record_spans([step_span], step.step_id)
+            session.update_step(
+                step.step_id,
+                status=StepStatus.FAILED,
+                details={"error": str(e)},
+                duration=step_span["duration_ms"],
+            )
+            session.finish_step(step.step_id, succeeded=False)
+            raise
+        finally:
+            lanes.release(lane_agent_id)
 
-        for i, step in enumerate(workflow_steps):
-            await accomplish_task(session, step, i)
-            session.current_step = i
-            session.set_progress(int((i / total_steps) * 100))
+        session.finish_step(step.step_id)
+        return result
+
+    try:
+        session.set_status(WorkflowStatus.IN_PROGRESS)
+
+        # Steps are added and started as the planner streams them, so the
+        # first step runs while the rest of the plan is still being written.
+        # Tool discovery for every step starts as soon as it is planned.
+        async def workflow_steps():
+            watch = Stopwatch()
+            async for step in stream_task_list(
+                session.agent_id, session.query, session=session
+            ):
+                if not session.steps:
+                    session.record_spans([watch.span("planning_first_task")])
+                added = session.add_step(
+                    action=step.task,
+                    depends_on=[f"step_{dep + 1}" for dep in step.depends_on],
+                )
+                prefetcher.prefetch(added.step_id, step.task)
+                yield step
+            session.record_spans([watch.span("planning")])
+
+        await DagScheduler().run(workflow_steps(), run_step)
 
-        session.status = WorkflowStatus.SUCCEEDED
         session.set_progress(100)
+        session.set_status(WorkflowStatus.SUCCEEDED)
 
     except Exception as e:
-        session.status = WorkflowStatus.FAILED
-        session.error_message = str(e)
-        # Mark current step as failed if it exists
-        if session.steps and session.current_step < len(session.steps):
-            current_step = session.steps[session.current_step]
-            session.update_step(
-                current_step.step_id,
-                status=StepStatus.FAILED,
-                details={"error": str(e)},
-            )
+        session.set_status(WorkflowStatus.FAILED, error_message=str(e))
+    finally:
+        prefetcher.cancel()
+        print("tool prefetch:", prefetcher.stats())
+        await lanes.close()
+        if owns_agent:
+            # The session stays addressable by this agent's id, so it is
+            # deleted rather than recycled into another workflow.
+            agent_pool.release_later(agent_id, recycle=False)
 
 
 @app.get("/workflow/{agent_id}/steps")
@@ -180,13 +320,10 @@ def get_steps(agent_id: str):
     #     "steps": [{"name": "hi", "id": "0"}, {"name": "bye", "id": "1"}],
     # }
 
-    if agent_id not in workflow_sessions:
+    session = session_store.get(agent_id)
+    if session is None:
         raise HTTPException(status_code=404, detail="Agent not found")
 
-    session = workflow_sessions[agent_id]
-
-    print(session.to_dict())
-
     if not session.steps:
         return {"status": 1}
 
@@ -196,6 +333,31 @@ def get_steps(agent_id: str):
     }
 
 
+@app.get("/workflow/{agent_id}/timings")
+def get_workflow_timings(agent_id: str):
+    """
+    Where each step's time went: its duration and milliseconds per phase,
+    plus the session-level planning spans.
+    """
+    session = session_store.get(agent_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Agent not found")
+
+    return {
+        "spans": session.spans,
+        "steps": [
+            {
+                "step_id": step.step_id,
+                "action": step.action,
+                "duration": step.duration,
+                "phases": step.phase_totals(),
+                "spans": step.spans,
+            }
+            for step in session.steps
+        ],
+    }
+
+
 @app.get("/workflow/{agent_id}/{step_id}")
 def get_step_info(agent_id: str, step_id: str):
     # steps = [
@@ -222,11 +384,10 @@ def get_step_info(agent_id: str, step_id: str):
     # ]
     # return steps[int(step_id)].to_dict()
 
-    if agent_id not in workflow_sessions:
+    session = session_store.get(agent_id)
+    if session is None:
         raise HTTPException(status_code=404, detail="Agent not found")
 
-    session = workflow_sessions[agent_id]
-
     if not session.steps:
         return {"status": 1}
 
@@ -256,6 +417,99 @@ async def search_vectors_get(
     return await search_vectors(query, k)
 
 
+@app.post("/search/batch", response_model=BatchSearchResponse)
+async def search_vectors_batch_post(request: BatchSearchRequest):
+    """
+    Search for several queries at once; results are returned in query order.
+    """
+    return BatchSearchResponse(results=await search_vectors_batch(request.queries))
+
+
+@app.get("/search/stats")
+async def get_search_stats():
+    """
+    Embedding and search result cache hit rates, de-duplicated searches and
+    the micro-batch size histogram.
+    """
+    return search_stats()
+
+
+@app.get("/sessions/metrics")
+async def get_session_metrics():
+    """
+    Live, finished and evicted workflow session counts.
+    """
+    return session_store.metrics()
+
+
+@app.get("/tools/stats")
+async def get_tool_stats():
+    """
+    Letta API calls spent and saved by tool-set reconciliation and the MCP
+    server registry cache, the size of the tool-level index, and how many
+    servers adaptive routing has chosen per step.
+    """
+    return {
+        "reconciler": tool_reconciler.stats(),
+        "registry": mcp_registry.stats(),
+        "index": (
+            resources.tool_index().stats()
+            if resources.registry.loaded("tool_index")
+            else None
+        ),
+        "routing": router.stats(),
+    }
+
+
+@app.get("/agents/stats")
+async def get_agent_pool_stats():
+    """
+    Pre-warmed agent pool size, hit rate and recycled/deleted agent counts.
+    """
+    return agent_pool.stats()
+
+
+@app.get("/plans/stats")
+async def get_plan_cache_stats():
+    """
+    Semantic plan cache hit rate and planning time saved, and fast-path
+    planner decisions with their agreement with the LLM planner.
+    """
+    return {**plan_cache.stats(), "fast_path": fast_planner.stats()}
+
+
+@app.get("/llm/stats")
+async def get_llm_stats():
+    """
+    Groq calls made through the shared rate limiter and time spent waiting.
+    """
+    return {"groq": resources.groq_limiter().stats()}
+
+
+@app.get("/timings/stats")
+async def get_timing_stats():
+    """
+    p50/p95/p99 milliseconds per workflow phase across recent sessions.
+    """
+    return phase_timings.stats()
+
+
+@app.get("/startup")
+async def get_startup_report():
+    """
+    Time spent initialising each shared resource, and time to readiness.
+    """
+    return resources.startup_report()
+
+
+@app.post("/search/sync")
+async def sync_search_catalog():
+    """
+    Reload the in-process catalog index from Qdrant.
+    """
+    return {"status": 0, "points": await sync_catalog()}
+
+
 async def main():
     await init_letta()
     port = int(os.getenv("PORT", 8000))
@@ -0,0 +1,75 @@
+import asyncio
+from collections import deque
+from typing import Callable
+
+
+class EventLog:
+    """
+    Append-only, bounded log of workflow events with monotonically increasing
+    sequence numbers. Streaming clients read everything after the last id
+    they saw and then wait for the next `publish`.
+    """
+
+    def __init__(self, maxlen: int = 1000):
+        self.events: deque[dict] = deque(maxlen=maxlen)
+        self.seq = 0
+        self.closed = False
+        self._waiters: set[asyncio.Future] = set()
+        self._listeners: list[Callable[[dict], None]] = []
+
+    @property
+    def first_id(self) -> int:
+        return self.events[0]["id"] if self.events else self.seq + 1
+
+    def publish(self, event_type: str, data) -> dict:
+        self.seq += 1
+        event = {"id": self.seq, "type": event_type, "data": data}
+        self.events.append(event)
+        self._wake()
+        for listener in self._listeners:
+            listener(event)
+        return event
+
+    def subscribe(self, listener: Callable[[dict], None]) -> None:
+        """
+        Call `listener(event)` synchronously on every publish.
+        """
+        self._listeners.append(listener)
+
+    def close(self) -> None:
+        self.closed = True
+        self._wake()
+
+    def _wake(self) -> None:
+        for waiter in self._waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+        self._waiters.clear()
+
+    def since(self, last_id: int) -> list[dict]:
+        return [event for event in self.events if event["id"] > last_id]
+
+    def missed(self, last_id: int) -> bool:
+        """
+        Whether events after `last_id` have already been dropped from the log.
+        """
+        return last_id + 1 < self.first_id
+
+    async def wait(self, last_id: int, timeout: float | None = None) -> list[dict]:
+        """
+        Events after `last_id`, waiting up to `timeout` seconds for one to
+        arrive if there are none yet.
+        """
+        events = self.since(last_id)
+        if events or self.closed:
+            return events
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.add(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except TimeoutError:
+            pass
+        finally:
+            self._waiters.discard(waiter)
+        return self.since(last_id)
@@ -2,6 +2,8 @@ import os
 
 from groq import AsyncGroq
 
+from .rate_limit import GroqLimiter
+
 
 def init_groq() -> AsyncGroq:
     groq_client = AsyncGroq(
@@ -12,8 +14,15 @@ def init_groq() -> AsyncGroq:
 
 
 async def groq_complete(
-    groq_client: AsyncGroq, system_prompt: str, user_prompt: str
+    groq_client: AsyncGroq,
+    system_prompt: str,
+    user_prompt: str,
+    limiter: GroqLimiter = None,
 ) -> str:
+    if limiter is not None:
+        async with limiter.limit(limiter.estimate_tokens(system_prompt, user_prompt)):
+            return await groq_complete(groq_client, system_prompt, user_prompt)
+
     chat_completion = await groq_client.chat.completions.create(
         messages=[
             {"role": "system", "content": system_prompt},
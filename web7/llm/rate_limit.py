@@ -0,0 +1,81 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+
+
+class TokenBucket:
+    """
+    Refills `rate_per_minute` tokens per minute up to `capacity`; `acquire`
+    waits until enough tokens are available.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: float | None = None):
+        self.rate = rate_per_minute / 60
+        self.capacity = capacity or rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1) -> float:
+        """
+        Take `amount` tokens and return how long we waited for them.
+        """
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            self._refill()
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return waited
+            delay = (amount - self.tokens) / self.rate
+            waited += delay
+            await asyncio.sleep(delay)
+
+
+class GroqLimiter:
+    """
+    Keeps Groq traffic under its per-minute request and token limits and caps
+    the number of completions in flight.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float | None = None,
+        tokens_per_minute: float | None = None,
+        max_concurrency: int | None = None,
+    ):
+        self.requests = TokenBucket(
+            requests_per_minute or float(os.getenv("GROQ_RPM", 30))
+        )
+        self.tokens = TokenBucket(tokens_per_minute or float(os.getenv("GROQ_TPM", 6000)))
+        self.semaphore = asyncio.Semaphore(
+            max_concurrency or int(os.getenv("GROQ_MAX_CONCURRENCY", 4))
+        )
+        self.calls = 0
+        self.waited = 0.0
+
+    @staticmethod
+    def estimate_tokens(*texts: str, completion_tokens: int = 64) -> int:
+        # About four characters per token for English text.
+        return sum(len(text) for text in texts) // 4 + completion_tokens
+
+    @asynccontextmanager
+    async def limit(self, estimated_tokens: int):
+        async with self.semaphore:
+            self.waited += await self.requests.acquire()
+            self.waited += await self.tokens.acquire(estimated_tokens)
+            self.calls += 1
+            yield
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "waited_s": round(self.waited, 3),
+            "requests_available": round(self.requests.tokens, 1),
+            "tokens_available": round(self.tokens.tokens, 1),
+        }
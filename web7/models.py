@@ -1,9 +1,13 @@
-from dataclasses import dataclass
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from datetime import datetime
 from pydantic import BaseModel, Field
 from typing import List, Optional, Self
 from enum import Enum
 
+from .events import EventLog
+from .timing import phase_timings, timed
+
 from fastapi import FastAPI, HTTPException, Query, BackgroundTasks
 
 
@@ -45,6 +49,9 @@ class MCPResponse(BaseModel):
     authentication: Optional[str] = Field(
         default=None, description="The authentication token"
     )
+    score: Optional[float] = Field(
+        default=None, description="Cosine similarity of the server to the query"
+    )
 
 
 class SearchResponse(BaseModel):
@@ -55,6 +62,20 @@ class SearchResponse(BaseModel):
     servers: List[MCPResponse] = Field(..., description="List of search results")
 
 
+class BatchSearchRequest(BaseModel):
+    """Model for a batch of search queries."""
+
+    queries: List[SearchQuery] = Field(
+        ..., description="The queries to search for", min_length=1, max_length=100
+    )
+
+
+class BatchSearchResponse(BaseModel):
+    """Model for batch search response, one result per query in order."""
+
+    results: List[SearchResponse] = Field(..., description="Results per query")
+
+
 class WorkflowStatus(Enum):
     STARTED = 1
     IN_PROGRESS = 2
@@ -99,6 +120,20 @@ class Step:
     timestamp: str
     details: str
     duration: float
+    depends_on: list[str] = field(default_factory=list)
+    metrics: dict = field(default_factory=dict)
+    spans: list[dict] = field(default_factory=list)
+
+    def phase_totals(self) -> dict[str, float]:
+        """
+        Milliseconds spent per phase, summed over the step's spans.
+        """
+        totals: dict[str, float] = {}
+        for span in self.spans:
+            totals[span["name"]] = round(
+                totals.get(span["name"], 0) + span["duration_ms"], 2
+            )
+        return totals
 
     def to_dict(self):
         """
@@ -113,8 +148,27 @@ class Step:
             "timestamp": self.timestamp,
             "details": self.details,
             "duration": self.duration,
+            "depends_on": self.depends_on,
+            "metrics": self.metrics,
+            "spans": self.spans,
         }
 
+    @classmethod
+    def from_dict(cls, data: dict) -> Self:
+        return cls(
+            step_id=data["step_id"],
+            action=data["action"],
+            mcp_server=data["mcp_server"],
+            mcp_server_img_url=data["mcp_server_img_url"],
+            status=StepStatus[data["status"].upper()],
+            timestamp=data["timestamp"],
+            details=data["details"],
+            duration=data["duration"],
+            depends_on=data.get("depends_on", []),
+            metrics=data.get("metrics", {}),
+            spans=data.get("spans", []),
+        )
+
 
 class WorkflowSession:
     def __init__(self, agent_id: str, query: str):
@@ -124,17 +178,23 @@ class WorkflowSession:
         self.steps: list[Step] = []
         self.plan: list[str] = []
         self.current_step = 0
+        self.running_steps: set[str] = set()
+        self.completed_steps: set[str] = set()
         self.logs: list[str] = []
         self.created_at = datetime.now()
         self.updated_at = datetime.now()
         self.progress_percentage = 0
         self.error_message = None
+        # Spans not tied to one step, such as planning.
+        self.spans: list[dict] = []
+        self.events = EventLog()
 
     def add_step(
         self,
         action: str,
         status: StepStatus = StepStatus.NOT_STARTED,
         details: str = None,
+        depends_on: list[str] = None,
     ):
         step = Step(
             step_id=f"step_{len(self.steps) + 1}",
@@ -145,16 +205,18 @@ class WorkflowSession:
             details=details,
             timestamp=datetime.now().isoformat(),
             duration=None,
+            depends_on=depends_on or [],
         )
         self.steps.append(step)
         self.updated_at = datetime.now()
+        self.events.publish("step_added", step.to_dict())
         return step
 
     def update_step(
         self,
         step_id: str,
         status: str,
-        mcp_server_img_url: str,
+        mcp_server_img_url: str = None,
         details: dict = None,
         duration: float = None,
     ):
@@ -163,16 +225,104 @@ class WorkflowSession:
                 step.status = status
                 step.timestamp = datetime.now().isoformat()
                 step.details = details
-                step.mcp_server_img_url = mcp_server_img_url
+                if mcp_server_img_url is not None:
+                    step.mcp_server_img_url = mcp_server_img_url
                 if duration:
                     step.duration = duration
+                self.events.publish("step_updated", step.to_dict())
+                break
+        self.updated_at = datetime.now()
+
+    def record_step_metrics(self, step_id: str, **metrics):
+        for step in self.steps:
+            if step.step_id == step_id:
+                step.metrics.update(metrics)
+                self.events.publish(
+                    "step_metrics", {"step_id": step_id, "metrics": step.metrics}
+                )
+                break
+
+    def record_spans(self, spans: list[dict], step_id: str = None):
+        """
+        Attach timing spans to a step (or the session itself without
+        `step_id`) and add them to the cross-session phase percentiles.
+        """
+        target = self.spans
+        for step in self.steps:
+            if step.step_id == step_id:
+                target = step.spans
                 break
+        target.extend(spans)
+        for span in spans:
+            phase_timings.record(span)
+        self.events.publish("spans", {"step_id": step_id, "spans": spans})
+
+    @contextmanager
+    def span(self, name: str, step_id: str = None):
+        spans = []
+        try:
+            with timed(spans, name) as watch:
+                yield watch
+        finally:
+            self.record_spans(spans, step_id)
+
+    def start_step(self, step_id: str):
+        self.running_steps.add(step_id)
+        self._update_current_step()
+        self.events.publish("step_status", {"step_id": step_id, "state": "running"})
+
+    def finish_step(self, step_id: str, succeeded: bool = True):
+        self.running_steps.discard(step_id)
+        if succeeded:
+            self.completed_steps.add(step_id)
+        self._update_current_step()
+        self.events.publish(
+            "step_status",
+            {"step_id": step_id, "state": "completed" if succeeded else "failed"},
+        )
+        if self.steps:
+            self.set_progress(int(len(self.completed_steps) / len(self.steps) * 100))
+
+    def _update_current_step(self):
+        # With several steps in flight, report the earliest one still running.
+        indices = [
+            i for i, step in enumerate(self.steps) if step.step_id in self.running_steps
+        ]
+        if indices:
+            self.current_step = min(indices)
         self.updated_at = datetime.now()
 
     def set_progress(self, percentage: int):
-        self.progress_percentage = max(0, min(100, percentage))
+        percentage = max(0, min(100, percentage))
+        if percentage != self.progress_percentage:
+            self.events.publish(
+                "progress",
+                {"progress_percentage": percentage, "current_step": self.current_step},
+            )
+        self.progress_percentage = percentage
         self.updated_at = datetime.now()
 
+    def set_status(self, status: WorkflowStatus, error_message: str = None):
+        self.status = status
+        if error_message is not None:
+            self.error_message = error_message
+        self.updated_at = datetime.now()
+        self.events.publish(
+            "status",
+            {"status": status.name.lower(), "error_message": self.error_message},
+        )
+        if self.is_finished:
+            self.events.close()
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (WorkflowStatus.SUCCEEDED, WorkflowStatus.FAILED)
+
+    def append_log(self, line: str, step_id: str = None):
+        self.logs.append(line)
+        self.updated_at = datetime.now()
+        self.events.publish("log", {"line": line, "step_id": step_id})
+
     def to_dict(self):
         """
         Serialize WorkflowSession to a dictionary.
@@ -183,8 +333,42 @@ class WorkflowSession:
             "status": self.status.name.lower(),
             "steps": [step.to_dict() for step in self.steps],
             "current_step": self.current_step,
+            "running_steps": [
+                step.step_id for step in self.steps if step.step_id in self.running_steps
+            ],
             "created_at": self.created_at.isoformat(),
             "updated_at": self.updated_at.isoformat(),
             "progress_percentage": self.progress_percentage,
             "error_message": self.error_message,
+            "spans": self.spans,
+        }
+
+    def to_record(self) -> dict:
+        """
+        Everything needed to rebuild the session in another process.
+        """
+        return {
+            **self.to_dict(),
+            "plan": self.plan,
+            "logs": self.logs,
+            "completed_steps": sorted(self.completed_steps),
         }
+
+    @classmethod
+    def from_record(cls, record: dict) -> Self:
+        session = cls(record["agent_id"], record["query"])
+        session.status = WorkflowStatus[record["status"].upper()]
+        session.steps = [Step.from_dict(step) for step in record["steps"]]
+        session.plan = record.get("plan", [])
+        session.current_step = record["current_step"]
+        session.running_steps = set(record.get("running_steps", []))
+        session.completed_steps = set(record.get("completed_steps", []))
+        session.logs = record.get("logs", [])
+        session.created_at = datetime.fromisoformat(record["created_at"])
+        session.updated_at = datetime.fromisoformat(record["updated_at"])
+        session.progress_percentage = record["progress_percentage"]
+        session.error_message = record["error_message"]
+        session.spans = record.get("spans", [])
+        if session.is_finished:
+            session.events.close()
+        return session
@@ -0,0 +1,186 @@
+"""
+Application-scoped registry of shared clients and models.
+
+Nothing here is created at import time. Each resource is built on first use
+(or eagerly by `warm_up` from the FastAPI lifespan hook) and every module gets
+the same instance, so a process holds one Letta client, one Groq client and
+one copy of the embedding model.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from typing import Any, Callable
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PROCESS_STARTED = time.perf_counter()
+
+
+class ResourceRegistry:
+    def __init__(self):
+        self._factories: dict[str, Callable[[], Any]] = {}
+        self._instances: dict[str, Any] = {}
+        self._lock = threading.RLock()
+        self.timings: dict[str, float] = {}
+        self.ready_at: float | None = None
+
+    def register(self, name: str, factory: Callable[[], Any]) -> None:
+        self._factories[name] = factory
+
+    def get(self, name: str) -> Any:
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+
+        with self._lock:
+            if name not in self._instances:
+                start = time.perf_counter()
+                self._instances[name] = self._factories[name]()
+                self.timings[name] = time.perf_counter() - start
+                print(f"initialised {name} in {self.timings[name] * 1000:.1f}ms")
+            return self._instances[name]
+
+    def loaded(self, name: str) -> bool:
+        return name in self._instances
+
+    def reset(self) -> None:
+        with self._lock:
+            self._instances.clear()
+            self.timings.clear()
+
+    def report(self) -> dict:
+        return {
+            "resources_ms": {
+                name: round(seconds * 1000, 1) for name, seconds in self.timings.items()
+            },
+            "loaded": sorted(self._instances),
+            "ready_after_ms": (
+                round((self.ready_at - PROCESS_STARTED) * 1000, 1)
+                if self.ready_at is not None
+                else None
+            ),
+        }
+
+
+registry = ResourceRegistry()
+
+
+def _create_letta():
+    from letta_client import AsyncLetta
+
+    return AsyncLetta(token=os.getenv("LETTA_API_KEY"))
+
+
+def _create_groq():
+    from .llm.groq import init_groq
+
+    return init_groq()
+
+
+def _create_groq_limiter():
+    from .llm.rate_limit import GroqLimiter
+
+    return GroqLimiter()
+
+
+def _create_encoder():
+    from .search.encoders import create_encoder
+
+    return create_encoder()
+
+
+def _create_embedding_service():
+    from .search.embedding_service import EmbeddingService
+
+    return EmbeddingService(encoder())
+
+
+def _create_qdrant():
+    from .search.qdrant_vector_search.qdrant_client import QdrantVectorDb
+
+    return QdrantVectorDb()
+
+
+def _create_tool_index():
+    from .search.tool_index import ToolIndex
+
+    return ToolIndex()
+
+
+def _create_vector_service():
+    from .search.vector_service import create_vector_service
+
+    return create_vector_service()
+
+
+registry.register("letta", _create_letta)
+registry.register("groq", _create_groq)
+registry.register("groq_limiter", _create_groq_limiter)
+registry.register("encoder", _create_encoder)
+registry.register("embedding_service", _create_embedding_service)
+registry.register("qdrant", _create_qdrant)
+registry.register("tool_index", _create_tool_index)
+registry.register("vector_service", _create_vector_service)
+
+
+def letta():
+    return registry.get("letta")
+
+
+def groq():
+    return registry.get("groq")
+
+
+def groq_limiter():
+    return registry.get("groq_limiter")
+
+
+def encoder():
+    return registry.get("encoder")
+
+
+def embedding_service():
+    return registry.get("embedding_service")
+
+
+def qdrant():
+    return registry.get("qdrant")
+
+
+def tool_index():
+    return registry.get("tool_index")
+
+
+def vector_service():
+    return registry.get("vector_service")
+
+
+async def warm_up() -> None:
+    """
+    Build every resource up front and run one query through the encoder and
+    the search index so the first user request does not pay for it.
+    """
+    for name in ("letta", "groq", "encoder", "embedding_service", "vector_service"):
+        await asyncio.to_thread(registry.get, name)
+
+    start = time.perf_counter()
+    service = vector_service()
+    if hasattr(service, "ensure_loaded"):
+        await service.ensure_loaded()
+    await embedding_service().embed("warm up")
+    registry.timings["first_query"] = time.perf_counter() - start
+
+
+async def shutdown() -> None:
+    if registry.loaded("embedding_service"):
+        await embedding_service().close()
+    if registry.loaded("vector_service") and hasattr(vector_service(), "close"):
+        vector_service().close()
+
+
+def startup_report() -> dict:
+    return registry.report()
@@ -0,0 +1,154 @@
+import asyncio
+import os
+from collections import Counter
+
+from ..cache import TTLCache
+
+
+class EmbeddingService:
+    """
+    Micro-batching front end for a sentence encoder.
+
+    Concurrent `embed` calls are queued and a background worker gathers them
+    into batches of up to `max_batch_size` queries or `max_wait_ms`
+    milliseconds, whichever comes first. Each batch is encoded in a worker
+    thread so the event loop never blocks on the model. Results are kept in an
+    LRU cache keyed by normalized query text.
+    """
+
+    def __init__(
+        self,
+        encoder,
+        max_batch_size: int | None = None,
+        max_wait_ms: float | None = None,
+        cache_size: int | None = None,
+        cache_ttl: float | None = None,
+    ):
+        self.encoder = encoder
+        self.max_batch_size = max_batch_size or int(os.getenv("EMBED_MAX_BATCH", 32))
+        self.max_wait = (
+            max_wait_ms
+            if max_wait_ms is not None
+            else float(os.getenv("EMBED_MAX_WAIT_MS", 5))
+        ) / 1000
+        self.cache = TTLCache(
+            maxsize=cache_size or int(os.getenv("EMBED_CACHE_SIZE", 1024)),
+            ttl=cache_ttl or float(os.getenv("EMBED_CACHE_TTL", 3600)),
+        )
+
+        self._queue: asyncio.Queue | None = None
+        self._worker: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._inflight: dict[str, asyncio.Future] = {}
+        self.batch_sizes: Counter[int] = Counter()
+        self.encoded = 0
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        # all-MiniLM-L6-v2 uses an uncased tokenizer, so case and repeated
+        # whitespace do not change the embedding.
+        return " ".join(text.lower().split())
+
+    def _ensure_worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._worker is not None and not self._worker.done() and self._loop is loop:
+            return
+
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._inflight = {}
+        self._worker = loop.create_task(self._run())
+
+    async def embed(self, text: str):
+        """
+        Return the embedding for `text`, batching it with concurrent requests.
+        """
+        key = self.normalize(text)
+        vector = self.cache.get(key)
+        if vector is not None:
+            return vector
+
+        self._ensure_worker()
+        future = self._inflight.get(key)
+        if future is None:
+            future = self._loop.create_future()
+            self._inflight[key] = future
+            self._queue.put_nowait((key, future))
+
+        return await asyncio.shield(future)
+
+    async def embed_many(self, texts: list[str]) -> list:
+        """
+        Return embeddings for all of `texts`, encoding the uncached ones in a
+        single model call.
+        """
+        keys = [self.normalize(text) for text in texts]
+        vectors = {key: self.cache.get(key) for key in dict.fromkeys(keys)}
+        missing = [key for key, vector in vectors.items() if vector is None]
+
+        if missing:
+            self.batch_sizes[len(missing)] += 1
+            encoded = await asyncio.to_thread(self.encoder.encode, missing)
+            self.encoded += len(missing)
+            for key, vector in zip(missing, encoded):
+                self.cache.set(key, vector)
+                vectors[key] = vector
+
+        return [vectors[key] for key in keys]
+
+    async def _next_batch(self) -> list[tuple[str, asyncio.Future]]:
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except TimeoutError:
+                break
+
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._next_batch()
+            texts = [text for text, _ in batch]
+            self.batch_sizes[len(batch)] += 1
+
+            try:
+                vectors = await asyncio.to_thread(self.encoder.encode, texts)
+            except Exception as e:
+                print(f"An error occurred during embedding: {e}")
+                for text, future in batch:
+                    self._inflight.pop(text, None)
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.encoded += len(texts)
+            for (text, future), vector in zip(batch, vectors):
+                self.cache.set(text, vector)
+                self._inflight.pop(text, None)
+                if not future.done():
+                    future.set_result(vector)
+
+    async def close(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+            self._worker = None
+
+    def stats(self) -> dict:
+        batches = sum(self.batch_sizes.values())
+        queued = sum(size * count for size, count in self.batch_sizes.items())
+        return {
+            "cache": self.cache.stats(),
+            "batches": batches,
+            "encoded": self.encoded,
+            "mean_batch_size": queued / batches if batches else 0.0,
+            "batch_size_histogram": dict(sorted(self.batch_sizes.items())),
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+        }
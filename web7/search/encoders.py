@@ -0,0 +1,147 @@
+"""
+Sentence encoders for the search index.
+
+Every backend produces all-MiniLM-L6-v2 embeddings, so vectors from one can be
+searched against an index built with another. `create_encoder` picks the
+backend from ENCODER_BACKEND:
+
+- "sentence-transformers" (default): the PyTorch model
+- "fastembed": the ONNX export run by fastembed, no PyTorch import
+- "onnx-int8": the same ONNX export with int8 dynamic-quantized weights
+"""
+
+import os
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from .qdrant_vector_search.qdrant_client import EMBEDDING_MODEL
+
+ONNX_REPO = "Qdrant/all-MiniLM-L6-v2-onnx"
+MAX_TOKENS = 256
+
+
+class Encoder(ABC):
+    name: str
+    dim: int = 384
+
+    @abstractmethod
+    def _encode(self, texts: list[str], batch_size: int) -> np.ndarray: ...
+
+    def encode(
+        self, texts: str | list[str], batch_size: int = 32, normalize_embeddings=False
+    ) -> np.ndarray:
+        """
+        Embed `texts` as a float32 (n, dim) array, or a single (dim,) vector
+        when given one string, like `SentenceTransformer.encode`.
+        """
+        single = isinstance(texts, str)
+        vectors = self._encode([texts] if single else list(texts), batch_size)
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        if normalize_embeddings:
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12
+        return vectors[0] if single else vectors
+
+
+class SentenceTransformerEncoder(Encoder):
+    name = "sentence-transformers"
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name)
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def _encode(self, texts: list[str], batch_size: int) -> np.ndarray:
+        return self.model.encode(texts, batch_size=batch_size)
+
+
+class FastEmbedEncoder(Encoder):
+    name = "fastembed"
+
+    def __init__(self, model_name: str = f"sentence-transformers/{EMBEDDING_MODEL}"):
+        from fastembed import TextEmbedding
+
+        self.model = TextEmbedding(model_name=model_name)
+
+    def _encode(self, texts: list[str], batch_size: int) -> np.ndarray:
+        if not texts:
+            return np.empty((0, self.dim), dtype=np.float32)
+        return np.stack(list(self.model.embed(texts, batch_size=batch_size)))
+
+
+class OnnxInt8Encoder(Encoder):
+    """
+    Runs the ONNX export directly with onnxruntime after quantizing its
+    weights to int8. The quantized model is written next to the original the
+    first time and reused afterwards.
+    """
+
+    name = "onnx-int8"
+
+    def __init__(self, model_dir: str | None = None):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        model_dir = model_dir or os.getenv("ENCODER_ONNX_DIR") or self.download()
+        quantized = os.path.join(model_dir, "model_int8.onnx")
+        if not os.path.exists(quantized):
+            self.quantize(os.path.join(model_dir, "model.onnx"), quantized)
+
+        self.session = onnxruntime.InferenceSession(
+            quantized, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=MAX_TOKENS)
+        self.tokenizer.enable_padding()
+
+    @staticmethod
+    def download() -> str:
+        from huggingface_hub import snapshot_download
+
+        return snapshot_download(
+            ONNX_REPO, allow_patterns=["model.onnx", "tokenizer.json", "*.json"]
+        )
+
+    @staticmethod
+    def quantize(source: str, target: str) -> None:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        print(f"quantizing {source} to int8")
+        tmp_path = f"{target}.tmp"
+        quantize_dynamic(source, tmp_path, weight_type=QuantType.QInt8)
+        os.replace(tmp_path, target)
+
+    def _encode(self, texts: list[str], batch_size: int) -> np.ndarray:
+        batches = []
+        for start in range(0, len(texts), batch_size):
+            encodings = self.tokenizer.encode_batch(texts[start : start + batch_size])
+            input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+            attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+            inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+            if "token_type_ids" in self.input_names:
+                inputs["token_type_ids"] = np.zeros_like(input_ids)
+
+            hidden = self.session.run(None, inputs)[0]
+            # Mean pooling over real tokens, as the sentence-transformers model does.
+            mask = attention_mask[..., None].astype(np.float32)
+            batches.append((hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9))
+        if not batches:
+            return np.empty((0, self.dim), dtype=np.float32)
+        return np.concatenate(batches)
+
+
+ENCODERS = {
+    encoder.name: encoder
+    for encoder in (SentenceTransformerEncoder, FastEmbedEncoder, OnnxInt8Encoder)
+}
+
+
+def create_encoder(backend: str | None = None) -> Encoder:
+    backend = backend or os.getenv("ENCODER_BACKEND", SentenceTransformerEncoder.name)
+    if backend not in ENCODERS:
+        raise ValueError(
+            f"unknown ENCODER_BACKEND {backend!r}, expected one of {sorted(ENCODERS)}"
+        )
+    return ENCODERS[backend]()
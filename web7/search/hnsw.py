@@ -0,0 +1,442 @@
+"""
+Hierarchical navigable small world (HNSW) graph for approximate top-k cosine
+search over large local catalogs.
+
+`HnswIndex` is a NumPy implementation of Malkov & Yashunin's algorithm with
+the neighbour-selection heuristic. `HnswlibIndex` wraps the optional
+`hnswlib` package behind the same interface and is used when installed.
+Both are keyed by catalog key, support inserts and deletes as the catalog
+re-syncs, and save to and load from a single file.
+"""
+
+import heapq
+import os
+from typing import Optional
+
+import numpy as np
+import orjson
+
+
+def _normalize(vector) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+    return vector / (np.linalg.norm(vector) + 1e-12)
+
+
+class HnswIndex:
+    """
+    m: int - links per node on the upper layers (2 * m on layer 0)
+    ef_construction: int - candidate list size while inserting
+    ef: int - default candidate list size while searching; higher is more
+        accurate and slower
+    """
+
+    def __init__(
+        self,
+        dim: int,
+        m: int = 16,
+        ef_construction: int = 200,
+        ef: int = 64,
+        seed: int = 0,
+    ):
+        self.dim = dim
+        self.m = m
+        self.ef_construction = ef_construction
+        self.ef = ef
+        self._level_mult = 1 / np.log(m)
+        self._rng = np.random.default_rng(seed)
+
+        self.vectors = np.empty((0, dim), dtype=np.float32)
+        self.count = 0
+        self.levels: list[int] = []
+        # links[node][level] is the node's neighbour list on that layer.
+        self.links: list[list[list[int]]] = []
+        self.keys: list[str] = []
+        self.ids: dict[str, int] = {}
+        self.deleted: set[int] = set()
+        self.entry = -1
+        self.max_level = -1
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.ids
+
+    def _grow(self) -> None:
+        if self.count < len(self.vectors):
+            return
+        vectors = np.empty((max(1024, 2 * len(self.vectors)), self.dim), dtype=np.float32)
+        vectors[: self.count] = self.vectors[: self.count]
+        self.vectors = vectors
+
+    def _search_layer(
+        self, query: np.ndarray, entries: list[int], ef: int, level: int
+    ) -> list[tuple[float, int]]:
+        """
+        Best-first search of one layer; returns up to `ef` (score, node)
+        pairs, best first.
+        """
+        visited = set(entries)
+        scores = (self.vectors[entries] @ query).tolist()
+        candidates = [(-score, node) for score, node in zip(scores, entries)]
+        heapq.heapify(candidates)
+        results = [(score, node) for score, node in zip(scores, entries)]
+        heapq.heapify(results)
+        while len(results) > ef:
+            heapq.heappop(results)
+
+        while candidates:
+            negative, node = heapq.heappop(candidates)
+            if len(results) >= ef and -negative < results[0][0]:
+                break
+            neighbours = [n for n in self.links[node][level] if n not in visited]
+            if not neighbours:
+                continue
+            visited.update(neighbours)
+            for score, neighbour in zip(
+                (self.vectors[neighbours] @ query).tolist(), neighbours
+            ):
+                if len(results) < ef or score > results[0][0]:
+                    heapq.heappush(candidates, (-score, neighbour))
+                    heapq.heappush(results, (score, neighbour))
+                    if len(results) > ef:
+                        heapq.heappop(results)
+
+        return sorted(results, reverse=True)
+
+    def _select(self, candidates: list[tuple[float, int]], m: int) -> list[int]:
+        """
+        Neighbour-selection heuristic: keep a candidate only if it is closer
+        to the base node than to every neighbour already kept, which spreads
+        links across clusters. Pruned candidates fill any remaining slots.
+        """
+        selected: list[int] = []
+        pruned: list[int] = []
+        for score, node in candidates:
+            if len(selected) >= m:
+                break
+            if not selected or float((self.vectors[selected] @ self.vectors[node]).max()) < score:
+                selected.append(node)
+            else:
+                pruned.append(node)
+        return selected + pruned[: m - len(selected)]
+
+    def add(self, key: str, vector) -> None:
+        """
+        Insert `key`, replacing its previous vector if it is already indexed.
+        """
+        vector = _normalize(vector)
+        if key in self.ids:
+            self.delete(key)
+
+        node = self.count
+        self._grow()
+        self.vectors[node] = vector
+        self.count += 1
+        level = int(-np.log(1 - self._rng.random()) * self._level_mult)
+        self.levels.append(level)
+        self.links.append([[] for _ in range(level + 1)])
+        self.keys.append(key)
+        self.ids[key] = node
+
+        if self.entry < 0:
+            self.entry, self.max_level = node, level
+            return
+
+        entries = [self.entry]
+        for layer in range(self.max_level, level, -1):
+            entries = [self._search_layer(vector, entries, 1, layer)[0][1]]
+
+        for layer in range(min(level, self.max_level), -1, -1):
+            found = self._search_layer(vector, entries, self.ef_construction, layer)
+            neighbours = self._select(found, self.m)
+            self.links[node][layer] = neighbours
+            limit = 2 * self.m if layer == 0 else self.m
+            for neighbour in neighbours:
+                links = self.links[neighbour][layer]
+                links.append(node)
+                if len(links) > limit:
+                    scores = (self.vectors[links] @ self.vectors[neighbour]).tolist()
+                    self.links[neighbour][layer] = self._select(
+                        sorted(zip(scores, links), reverse=True), limit
+                    )
+            entries = [n for _, n in found]
+
+        if level > self.max_level:
+            self.entry, self.max_level = node, level
+
+    def delete(self, key: str) -> None:
+        """
+        Remove `key` from results. The node stays in the graph as a waypoint
+        until `compact` rebuilds it.
+        """
+        node = self.ids.pop(key, None)
+        if node is not None:
+            self.deleted.add(node)
+
+    @property
+    def tombstone_ratio(self) -> float:
+        return len(self.deleted) / self.count if self.count else 0.0
+
+    def get_vectors(self, keys: list[str]) -> np.ndarray:
+        return self.vectors[[self.ids[key] for key in keys]]
+
+    def compact(self) -> "HnswIndex":
+        """
+        A new graph holding only the live nodes.
+        """
+        index = HnswIndex(self.dim, self.m, self.ef_construction, self.ef)
+        for key, node in self.ids.items():
+            index.add(key, self.vectors[node])
+        return index
+
+    def search(
+        self, query_vector, k: int, ef: Optional[int] = None
+    ) -> list[tuple[str, float]]:
+        if self.entry < 0 or k <= 0:
+            return []
+        query = _normalize(query_vector)
+        entries = [self.entry]
+        for layer in range(self.max_level, 0, -1):
+            entries = [self._search_layer(query, entries, 1, layer)[0][1]]
+        found = self._search_layer(query, entries, max(ef or self.ef, k), 0)
+        return [
+            (self.keys[node], score) for score, node in found if node not in self.deleted
+        ][:k]
+
+    def stats(self) -> dict:
+        return {
+            "impl": "numpy",
+            "points": len(self.ids),
+            "tombstones": len(self.deleted),
+            "m": self.m,
+            "ef": self.ef,
+            "ef_construction": self.ef_construction,
+            "layers": self.max_level + 1,
+        }
+
+    def save(self, path: str) -> None:
+        node_levels = [len(links) for links in self.links]
+        lengths = [len(links) for node in self.links for links in node]
+        data = [n for node in self.links for links in node for n in links]
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as file:
+            np.savez(
+                file,
+                vectors=self.vectors[: self.count],
+                node_levels=np.asarray(node_levels, dtype=np.int32),
+                link_lengths=np.asarray(lengths, dtype=np.int32),
+                link_data=np.asarray(data, dtype=np.int32),
+                deleted=np.asarray(sorted(self.deleted), dtype=np.int64),
+                meta=np.frombuffer(
+                    orjson.dumps(
+                        {
+                            "dim": self.dim,
+                            "m": self.m,
+                            "ef_construction": self.ef_construction,
+                            "ef": self.ef,
+                            "entry": self.entry,
+                            "max_level": self.max_level,
+                            "keys": self.keys,
+                        }
+                    ),
+                    dtype=np.uint8,
+                ),
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "HnswIndex":
+        with np.load(path) as data:
+            meta = orjson.loads(data["meta"].tobytes())
+            index = cls(meta["dim"], meta["m"], meta["ef_construction"], meta["ef"])
+            index.vectors = np.array(data["vectors"], dtype=np.float32)
+            index.count = len(index.vectors)
+            lengths = data["link_lengths"].tolist()
+            links = data["link_data"].tolist()
+            deleted = set(data["deleted"].tolist())
+
+            position = layer = 0
+            for node_levels in data["node_levels"].tolist():
+                node = []
+                for _ in range(node_levels):
+                    node.append(links[position : position + lengths[layer]])
+                    position += lengths[layer]
+                    layer += 1
+                index.links.append(node)
+
+        index.levels = [len(node) - 1 for node in index.links]
+        index.keys = meta["keys"]
+        index.deleted = deleted
+        index.ids = {
+            key: node for node, key in enumerate(index.keys) if node not in deleted
+        }
+        index.entry, index.max_level = meta["entry"], meta["max_level"]
+        return index
+
+
+class HnswlibIndex:
+    """
+    The same interface backed by `hnswlib`.
+    """
+
+    def __init__(
+        self,
+        dim: int,
+        m: int = 16,
+        ef_construction: int = 200,
+        ef: int = 64,
+        seed: int = 0,
+    ):
+        import hnswlib
+
+        self.dim = dim
+        self.ef = ef
+        self.m = m
+        self.ef_construction = ef_construction
+        self.index = hnswlib.Index(space="ip", dim=dim)
+        self.index.init_index(
+            max_elements=1024, M=m, ef_construction=ef_construction, random_seed=seed
+        )
+        self.index.set_ef(ef)
+        self.keys: list[str] = []
+        self.ids: dict[str, int] = {}
+        self.deleted: set[int] = set()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.ids
+
+    @property
+    def tombstone_ratio(self) -> float:
+        return len(self.deleted) / len(self.keys) if self.keys else 0.0
+
+    def get_vectors(self, keys: list[str]) -> np.ndarray:
+        if not keys:
+            return np.empty((0, self.dim), dtype=np.float32)
+        return np.asarray(
+            self.index.get_items([self.ids[key] for key in keys]), dtype=np.float32
+        )
+
+    def add(self, key: str, vector) -> None:
+        if key in self.ids:
+            self.delete(key)
+        label = len(self.keys)
+        if label >= self.index.get_max_elements():
+            self.index.resize_index(2 * self.index.get_max_elements())
+        self.index.add_items(_normalize(vector)[None, :], [label])
+        self.keys.append(key)
+        self.ids[key] = label
+
+    def delete(self, key: str) -> None:
+        label = self.ids.pop(key, None)
+        if label is not None:
+            self.index.mark_deleted(label)
+            self.deleted.add(label)
+
+    def compact(self) -> "HnswlibIndex":
+        # hnswlib reuses deleted slots itself only with allow_replace_deleted;
+        # a rebuild keeps labels dense.
+        vectors = self.index.get_items(list(self.ids.values()))
+        index = HnswlibIndex(self.dim, self.m, self.ef_construction, self.ef)
+        for key, vector in zip(self.ids, vectors):
+            index.add(key, vector)
+        return index
+
+    def search(
+        self, query_vector, k: int, ef: Optional[int] = None
+    ) -> list[tuple[str, float]]:
+        k = min(k, len(self.ids))
+        if k <= 0:
+            return []
+        self.index.set_ef(max(ef or self.ef, k))
+        labels, distances = self.index.knn_query(_normalize(query_vector)[None, :], k=k)
+        # The "ip" space reports 1 - dot product.
+        return [
+            (self.keys[label], 1 - float(distance))
+            for label, distance in zip(labels[0].tolist(), distances[0].tolist())
+        ]
+
+    def stats(self) -> dict:
+        return {
+            "impl": "hnswlib",
+            "points": len(self.ids),
+            "tombstones": len(self.deleted),
+            "m": self.m,
+            "ef": self.ef,
+            "ef_construction": self.ef_construction,
+        }
+
+    def save(self, path: str) -> None:
+        """
+        Write the graph to `path` and its keys to `path`.keys, each through a
+        temporary file. The keys record the graph file's size and point
+        count, so `load` can tell when the two come from different saves.
+        """
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        self.index.save_index(tmp_path)
+        graph_bytes = os.path.getsize(tmp_path)
+        os.replace(tmp_path, path)
+
+        keys_path = f"{path}.keys"
+        tmp_keys_path = f"{keys_path}.{os.getpid()}.tmp"
+        with open(tmp_keys_path, "wb") as file:
+            file.write(
+                orjson.dumps(
+                    {
+                        # hnswlib's own file does not carry the dimension, and
+                        # an index must be constructed with it before loading.
+                        "dim": self.dim,
+                        "m": self.m,
+                        "ef_construction": self.ef_construction,
+                        "ef": self.ef,
+                        "graph_bytes": graph_bytes,
+                        "keys": self.keys,
+                        "deleted": sorted(self.deleted),
+                    }
+                )
+            )
+        os.replace(tmp_keys_path, keys_path)
+
+    @classmethod
+    def load(cls, path: str) -> "HnswlibIndex":
+        import hnswlib
+
+        with open(f"{path}.keys", "rb") as file:
+            meta = orjson.loads(file.read())
+        if os.path.getsize(path) != meta.get("graph_bytes"):
+            raise ValueError(f"{path} does not match its keys file")
+        index = cls.__new__(cls)
+        index.dim = meta["dim"]
+        index.m = meta["m"]
+        index.ef_construction = meta["ef_construction"]
+        index.ef = meta["ef"]
+        index.index = hnswlib.Index(space="ip", dim=index.dim)
+        index.index.load_index(path, allow_replace_deleted=False)
+        index.index.set_ef(index.ef)
+        if index.index.get_current_count() != len(meta["keys"]):
+            raise ValueError(f"{path} does not match its keys file")
+        index.keys = meta["keys"]
+        index.deleted = set(meta["deleted"])
+        index.ids = {
+            key: label for label, key in enumerate(index.keys) if label not in index.deleted
+        }
+        return index
+
+
+def hnsw_class(impl: Optional[str] = None):
+    """
+    HNSW_IMPL: "auto" (hnswlib when installed), "numpy" or "hnswlib".
+    """
+    impl = impl or os.getenv("HNSW_IMPL", "auto")
+    if impl == "numpy":
+        return HnswIndex
+    if impl == "hnswlib":
+        return HnswlibIndex
+    try:
+        import hnswlib  # noqa: F401
+    except ImportError:
+        return HnswIndex
+    return HnswlibIndex
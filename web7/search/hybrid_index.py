@@ -0,0 +1,185 @@
+import asyncio
+import os
+import time
+from collections import defaultdict, deque
+from typing import Iterable, Optional
+
+import numpy as np
+
+from ..timing import percentile
+from .lexical_index import LexicalIndex
+from .local_vector_index import LocalVectorIndex
+
+# Weight of a rank in reciprocal rank fusion, as in the original RRF paper.
+RRF_K = 60
+# Minimum share of a server name's trigrams the query must contain to count
+# as a name match at all.
+NAME_MATCH_MIN = 0.6
+
+
+class HybridVectorIndex(LocalVectorIndex):
+    """
+    Local index that fuses the embedding ranking with BM25 over names and
+    descriptions and a server-name trigram match, using reciprocal rank
+    fusion. The fused top `rerank_top_n` can be reordered by a cross-encoder
+    when SEARCH_RERANK_MODEL is set, unless the query has already used up the
+    SEARCH_LATENCY_BUDGET_MS.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lexical = LexicalIndex([])
+        self.candidates = int(os.getenv("SEARCH_CANDIDATES", 50))
+        self.rerank_model = os.getenv("SEARCH_RERANK_MODEL", "")
+        self.rerank_top_n = int(os.getenv("SEARCH_RERANK_TOP_N", 20))
+        self.budget = float(os.getenv("SEARCH_LATENCY_BUDGET_MS", 50)) / 1000
+        self._reranker = None
+
+        self.timings: dict[str, deque] = defaultdict(lambda: deque(maxlen=1000))
+        self.queries = 0
+        self.reranked = 0
+        self.rerank_skipped = 0
+        self.over_budget = 0
+
+    def _prepare(self, vectors, payloads: list[dict], normalized: bool) -> dict:
+        state = super()._prepare(vectors, payloads, normalized)
+        state["lexical"] = LexicalIndex(state["payloads"])
+        return state
+
+    @property
+    def reranker(self):
+        if self._reranker is None and self.rerank_model:
+            from sentence_transformers import CrossEncoder
+
+            self._reranker = CrossEncoder(self.rerank_model)
+        return self._reranker
+
+    def _record(self, stage: str, seconds: float) -> None:
+        self.timings[stage].append(seconds * 1000)
+
+    def fuse(
+        self,
+        query: str,
+        vector_scores: np.ndarray,
+        mask: Optional[np.ndarray],
+        lexical: Optional[LexicalIndex] = None,
+    ) -> list[tuple[int, float]]:
+        """
+        Reciprocal rank fusion of the vector, BM25 and name-match rankings,
+        each cut to the top `candidates`.
+        """
+        lexical = lexical or self.lexical
+        bm25 = lexical.bm25(query)
+        name = lexical.name_match(query)
+        name[name < NAME_MATCH_MIN] = 0
+
+        fused: dict[int, float] = defaultdict(float)
+        for scores in (vector_scores, bm25, name):
+            if scores is not vector_scores:
+                scores = np.where(scores > 0, scores, -np.inf)
+            for rank, (i, score) in enumerate(self._rank(scores, self.candidates, mask)):
+                if score == -np.inf:
+                    break
+                fused[i] += 1 / (RRF_K + rank + 1)
+        return sorted(fused.items(), key=lambda item: -item[1])
+
+    async def rank_batch(
+        self,
+        queries: list[str],
+        query_vectors,
+        ks: list[int],
+        names: Optional[Iterable[str]] = None,
+    ) -> list[list[tuple[int, float]]]:
+        # The rerank awaits, and an update may swap in a new catalog meanwhile;
+        # every lookup below uses the one the vector scores came from.
+        vectors, payloads, lexical = self.vectors, self.payloads, self.lexical
+        if not len(payloads):
+            return [[] for _ in ks]
+
+        start = time.perf_counter()
+        mask = self.filter_mask(names) if names is not None else None
+        vector_scores = self.scores(query_vectors, mask)
+        scored = time.perf_counter()
+        self._record("vector", scored - start)
+
+        results = []
+        for query, query_vector, row, k in zip(queries, query_vectors, vector_scores, ks):
+            query_start = time.perf_counter()
+            fused = self.fuse(query, row, mask, lexical)
+            self._record("fuse", time.perf_counter() - query_start)
+
+            if self.rerank_model and len(fused) > 1:
+                if time.perf_counter() - start < self.budget:
+                    fused = await self.rerank(
+                        query, fused[: max(k, self.rerank_top_n)], payloads
+                    )
+                else:
+                    self.rerank_skipped += 1
+            results.append(self.similarities(fused[:k], row, query_vector, vectors))
+
+        elapsed = time.perf_counter() - start
+        self._record("total", elapsed / len(queries))
+        self.queries += len(queries)
+        if elapsed > self.budget * len(queries):
+            self.over_budget += 1
+        return results
+
+    def similarities(
+        self,
+        hits: list[tuple[int, float]],
+        row: np.ndarray,
+        query_vector,
+        vectors: Optional[np.ndarray] = None,
+    ) -> list[tuple[int, float]]:
+        """
+        Keep the fused order but report each hit's cosine similarity, which
+        unlike a fused or reranker score is comparable across queries. Hits
+        found only lexically are scored here.
+        """
+        vectors = self.vectors if vectors is None else vectors
+        query = np.asarray(query_vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) + 1e-12)
+        return [
+            (i, float(row[i]) if np.isfinite(row[i]) else float(vectors[i] @ query))
+            for i, _ in hits
+        ]
+
+    async def rerank(
+        self,
+        query: str,
+        candidates: list[tuple[int, float]],
+        payloads: Optional[list[dict]] = None,
+    ) -> list[tuple[int, float]]:
+        payloads = self.payloads if payloads is None else payloads
+        start = time.perf_counter()
+        pairs = [
+            (
+                query,
+                f"{payloads[i].get('name', '')}: "
+                f"{payloads[i].get('description', '')}",
+            )
+            for i, _ in candidates
+        ]
+        scores = await asyncio.to_thread(self.reranker.predict, pairs)
+        self._record("rerank", time.perf_counter() - start)
+        self.reranked += 1
+        order = np.argsort(-np.asarray(scores))
+        return [(candidates[j][0], float(scores[j])) for j in order]
+
+    def stats(self) -> dict:
+        return {
+            "queries": self.queries,
+            "budget_ms": self.budget * 1000,
+            "over_budget": self.over_budget,
+            "reranker": self.rerank_model or None,
+            "reranked": self.reranked,
+            "rerank_skipped": self.rerank_skipped,
+            "latency_ms": {
+                stage: {
+                    "p50": percentile(values, 50),
+                    "p95": percentile(values, 95),
+                    "p99": percentile(values, 99),
+                }
+                for stage, values in self.timings.items()
+            },
+        }
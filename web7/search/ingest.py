@@ -0,0 +1,194 @@
+"""
+Incremental catalog ingestion into Qdrant.
+
+Rows are streamed from the CSV produced by `composio-servers.py`, each row gets
+a deterministic point id derived from its key and a content hash stored in its
+payload, and only rows whose hash changed are re-encoded and upserted. Points
+whose key is no longer in the source are deleted, so a re-sync costs time
+proportional to the number of changed rows.
+"""
+
+import asyncio
+from dataclasses import dataclass, asdict
+from typing import Iterable, Iterator
+
+import click
+from qdrant_client import models
+
+from .qdrant_vector_search.qdrant_client import (
+    INDEXED_FIELDS,
+    QdrantVectorDb,
+    content_hash,
+    point_id,
+)
+from .snapshot import CATALOG_CSV, read_catalog_csv
+
+
+@dataclass
+class IngestStats:
+    seen: int = 0
+    unchanged: int = 0
+    upserted: int = 0
+    deleted: int = 0
+    encode_batches: int = 0
+    upsert_chunks: int = 0
+
+
+def _batched(rows: Iterable[dict], size: int) -> Iterator[list[dict]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class CatalogIngester:
+    """
+    Sync one Qdrant collection with a stream of catalog rows.
+
+    batch_size: int - rows encoded per model call
+    chunk_size: int - points per upsert request
+    concurrency: int - maximum upsert requests in flight
+    """
+
+    def __init__(
+        self,
+        db: QdrantVectorDb,
+        collection_name: str,
+        vector_field: str = "description",
+        key_field: str = "name",
+        batch_size: int = 256,
+        chunk_size: int = 64,
+        concurrency: int = 4,
+        dry_run: bool = False,
+    ):
+        self.db = db
+        self.collection_name = collection_name
+        self.vector_field = vector_field
+        self.key_field = key_field
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.concurrency = concurrency
+        self.dry_run = dry_run
+        self.stats = IngestStats()
+
+    async def _ensure_collection(self) -> None:
+        if not await self.db.client.collection_exists(self.collection_name):
+            print(f"creating collection {self.collection_name}")
+            if not self.dry_run:
+                await self.db.create_collection(self.collection_name)
+        elif not self.dry_run:
+            info = await self.db.client.get_collection(self.collection_name)
+            if not set(INDEXED_FIELDS) <= set(info.payload_schema or {}):
+                await self.db.create_payload_indexes(self.collection_name)
+
+    async def existing_hashes(self) -> dict[str, str]:
+        """
+        Map of point id to stored content hash, fetched without vectors.
+        """
+        hashes = {}
+        offset = None
+        while True:
+            points, offset = await self.db.client.scroll(
+                collection_name=self.collection_name,
+                limit=1024,
+                offset=offset,
+                with_payload=["content_hash"],
+                with_vectors=False,
+            )
+            for point in points:
+                hashes[str(point.id)] = (point.payload or {}).get("content_hash")
+            if offset is None:
+                return hashes
+
+    def _changed_rows(
+        self, rows: Iterable[dict], existing: dict[str, str], seen: set[str]
+    ) -> Iterator[tuple[str, dict]]:
+        for row in rows:
+            self.stats.seen += 1
+            pid = point_id(row[self.key_field])
+            seen.add(pid)
+            payload = {**row, "content_hash": content_hash(row)}
+            if existing.get(pid) == payload["content_hash"]:
+                self.stats.unchanged += 1
+                continue
+            yield pid, payload
+
+    async def _upsert(self, points: list[models.PointStruct], limiter) -> None:
+        try:
+            if not self.dry_run:
+                await self.db.client.upsert(
+                    collection_name=self.collection_name, points=points, wait=True
+                )
+            self.stats.upserted += len(points)
+            self.stats.upsert_chunks += 1
+        finally:
+            limiter.release()
+
+    async def sync(self, rows: Iterable[dict]) -> IngestStats:
+        await self._ensure_collection()
+        existing = await self.existing_hashes()
+        seen: set[str] = set()
+
+        limiter = asyncio.Semaphore(self.concurrency)
+        upserts = []
+        for batch in _batched(
+            self._changed_rows(rows, existing, seen), self.batch_size
+        ):
+            vectors = await asyncio.to_thread(
+                self.db.encoder.encode,
+                [payload[self.vector_field] for _, payload in batch],
+                batch_size=self.batch_size,
+            )
+            self.stats.encode_batches += 1
+
+            points = [
+                models.PointStruct(id=pid, vector=vector.tolist(), payload=payload)
+                for (pid, payload), vector in zip(batch, vectors)
+            ]
+            for chunk in _batched(points, self.chunk_size):
+                # Acquire before scheduling so encoding waits when upserts lag.
+                await limiter.acquire()
+                upserts.append(asyncio.create_task(self._upsert(chunk, limiter)))
+
+        await asyncio.gather(*upserts)
+
+        stale = [pid for pid in existing if pid not in seen]
+        if stale:
+            if not self.dry_run:
+                await self.db.client.delete(
+                    collection_name=self.collection_name,
+                    points_selector=models.PointIdsList(points=stale),
+                )
+            self.stats.deleted = len(stale)
+
+        return self.stats
+
+
+@click.command()
+@click.option("--csv", "csv_path", default=CATALOG_CSV, help="Catalog CSV to ingest.")
+@click.option("--collection", default=None, help="Target Qdrant collection.")
+@click.option("--batch-size", default=256, help="Rows encoded per model call.")
+@click.option("--chunk-size", default=64, help="Points per upsert request.")
+@click.option("--concurrency", default=4, help="Upsert requests in flight.")
+@click.option("--dry-run", is_flag=True, help="Compute the diff without writing.")
+def main(csv_path, collection, batch_size, chunk_size, concurrency, dry_run):
+    """Sync the MCP server catalog CSV into Qdrant."""
+    db = QdrantVectorDb()
+    ingester = CatalogIngester(
+        db,
+        collection or db.mcp_collection_name,
+        batch_size=batch_size,
+        chunk_size=chunk_size,
+        concurrency=concurrency,
+        dry_run=dry_run,
+    )
+    stats = asyncio.run(ingester.sync(read_catalog_csv(csv_path)))
+    click.echo(asdict(stats))
+
+
+if __name__ == "__main__":
+    main()
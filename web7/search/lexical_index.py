@@ -0,0 +1,87 @@
+"""
+In-memory lexical index over the catalog's server names and descriptions.
+
+Two rankings complement the embedding search: BM25 over word tokens of the
+name and description, and character-trigram overlap between the query and
+each server name with spaces and punctuation removed, so "google meet",
+"googlemeet" and "Googlemeet" all match the same server.
+"""
+
+import re
+from collections import defaultdict
+
+import numpy as np
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> list[str]:
+    return _WORD.findall(text.lower())
+
+
+def compact(text: str) -> str:
+    return "".join(tokenize(text))
+
+
+def trigrams(text: str) -> set[str]:
+    text = f"  {text} "
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+class LexicalIndex:
+    def __init__(self, payloads: list[dict], k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.size = len(payloads)
+
+        postings: dict[str, dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        lengths = np.zeros(self.size, dtype=np.float32)
+        self._name_grams: dict[str, list[int]] = defaultdict(list)
+        self._name_sizes = np.zeros(self.size, dtype=np.float32)
+
+        for i, payload in enumerate(payloads):
+            name = payload.get("name") or ""
+            # The name is counted twice so it outweighs a passing mention.
+            tokens = tokenize(f"{name} {name} {payload.get('description') or ''}")
+            lengths[i] = len(tokens)
+            for token in tokens:
+                postings[token][i] += 1
+
+            grams = trigrams(compact(name))
+            self._name_sizes[i] = len(grams)
+            for gram in grams:
+                self._name_grams[gram].append(i)
+
+        self._lengths = lengths
+        self._avg_length = float(lengths.mean()) if self.size else 0.0
+        self._postings = {
+            token: (
+                np.fromiter(docs.keys(), dtype=np.int64),
+                np.fromiter(docs.values(), dtype=np.float32),
+            )
+            for token, docs in postings.items()
+        }
+
+    def bm25(self, query: str) -> np.ndarray:
+        scores = np.zeros(self.size, dtype=np.float32)
+        if not self.size:
+            return scores
+        for token in set(tokenize(query)):
+            posting = self._postings.get(token)
+            if posting is None:
+                continue
+            docs, tf = posting
+            idf = np.log(1 + (self.size - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self._lengths[docs] / self._avg_length)
+            scores[docs] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+    def name_match(self, query: str) -> np.ndarray:
+        """
+        Fraction of each server name's trigrams that occur in the query.
+        """
+        hits = np.zeros(self.size, dtype=np.float32)
+        for gram in trigrams(compact(query)):
+            for i in self._name_grams.get(gram, ()):
+                hits[i] += 1
+        return hits / np.maximum(self._name_sizes, 1)
@@ -0,0 +1,479 @@
+import asyncio
+import copy
+import hashlib
+import os
+import tempfile
+import time
+from typing import Iterable, Optional
+
+import numpy as np
+
+from web7 import resources
+from web7.models import SearchQuery, SearchResponse
+from web7.search.hnsw import hnsw_class
+from web7.search.quantization import QuantizedVectors
+from web7.search.snapshot import load_snapshot, write_snapshot
+from web7.search.qdrant_vector_search.qdrant_client import (
+    EMBEDDING_MODEL,
+    QdrantVectorDb,
+    allowed_servers,
+    to_mcp_response,
+)
+
+
+class LocalVectorIndex:
+    """
+    In-process replacement for `QdrantVectorDb.search` over a small catalog.
+
+    All points are pulled from the remote collection once and kept as a
+    contiguous, row-normalized float32 matrix, so a top-k cosine query is one
+    matrix-vector product plus an `argpartition`. The remote Qdrant cluster is
+    only used by `sync`.
+
+    With `quantization` ("int8" or "binary", default VECTOR_QUANTIZATION) the
+    first pass runs over compressed vectors and only the best `rescore`
+    candidates are scored exactly against the float vectors, which are then
+    memory-mapped: from the snapshot when loaded from one, otherwise from a
+    file written to VECTOR_SPILL_DIR (default the system temp directory).
+    int8 is a memory saving only; binary is faster but rescores
+    `rescore` times VECTOR_BINARY_OVERSAMPLE candidates to make up for its
+    coarse ranking.
+
+    With `ann="hnsw"` (default VECTOR_ANN) the candidates come from an HNSW
+    graph instead of a full pass (tuned by HNSW_M, HNSW_EF_CONSTRUCTION and
+    HNSW_EF). The graph is updated in place on every sync, inserting new or
+    changed points and deleting removed ones, and is kept in HNSW_PATH when
+    set so a restart only indexes what changed.
+    """
+
+    def __init__(
+        self,
+        remote: Optional[QdrantVectorDb] = None,
+        collection_name: Optional[str] = None,
+        quantization: Optional[str] = None,
+        rescore: Optional[int] = None,
+        ann: Optional[str] = None,
+    ):
+        self.remote = remote or resources.qdrant()
+        self.collection_name = collection_name or self.remote.mcp_collection_name
+        self.quantization = (
+            quantization
+            if quantization is not None
+            else os.getenv("VECTOR_QUANTIZATION", "")
+        )
+        self.rescore = rescore or int(os.getenv("VECTOR_RESCORE_CANDIDATES", 100))
+        self.binary_oversample = int(os.getenv("VECTOR_BINARY_OVERSAMPLE", 50))
+        self.spill_dir = os.getenv("VECTOR_SPILL_DIR", "")
+        self.spill_path: Optional[str] = None
+        self.quantized: Optional[QuantizedVectors] = None
+        self.ann = ann if ann is not None else os.getenv("VECTOR_ANN", "")
+        if self.ann not in ("", "hnsw"):
+            raise ValueError(f"unknown VECTOR_ANN {self.ann!r}, expected 'hnsw'")
+        self.ann_path = os.getenv("HNSW_PATH", "")
+        self.ann_index = None
+        self._ann_rows: dict[str, int] = {}
+        self.ann_inserted = 0
+        self.ann_deleted = 0
+
+        self.vectors = np.empty((0, 0), dtype=np.float32)
+        self.payloads: list[dict] = []
+        self.names = np.empty(0, dtype=object)
+        self._masks: dict[frozenset, np.ndarray] = {}
+        self._lock = asyncio.Lock()
+        # Serializes updates, so each one starts from the graph the last one built.
+        self._update_lock = asyncio.Lock()
+        self.loaded = False
+
+    @property
+    def embedding_service(self):
+        return self.remote.embedding_service
+
+    def __len__(self) -> int:
+        return len(self.payloads)
+
+    def set_points(self, vectors, payloads: list[dict], normalized: bool = False) -> None:
+        """
+        Replace the index contents with `vectors` (one row per payload).
+        Already-normalized vectors, such as a memory-mapped snapshot, are used
+        in place without copying. This blocks; from a running event loop use
+        `update_points`.
+        """
+        self._apply(self._prepare(vectors, payloads, normalized))
+
+    async def update_points(
+        self, vectors, payloads: list[dict], normalized: bool = False
+    ) -> None:
+        """
+        `set_points` with the matrix, the quantized copy and the HNSW graph
+        built in a worker thread. Searches keep using the current contents
+        until the new ones are swapped in whole.
+        """
+        async with self._update_lock:
+            state = await asyncio.to_thread(self._prepare, vectors, payloads, normalized)
+            self._apply(state)
+
+    def _prepare(self, vectors, payloads: list[dict], normalized: bool) -> dict:
+        """
+        Everything `_apply` swaps in, built without touching the live index.
+        """
+        matrix = np.ascontiguousarray(vectors, dtype=np.float32)
+        if matrix.ndim != 2 or len(matrix) != len(payloads):
+            raise ValueError(
+                f"expected {len(payloads)} vectors, got array of shape {matrix.shape}"
+            )
+
+        if not normalized:
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            matrix = matrix / norms
+        quantized = spill_path = None
+        if self.quantization:
+            quantized = QuantizedVectors(matrix, self.quantization)
+            if not isinstance(vectors, np.memmap) and len(matrix):
+                matrix, spill_path = self._spill(matrix)
+        payloads = list(payloads)
+        state = {
+            "vectors": matrix,
+            "spill_path": spill_path,
+            "quantized": quantized,
+            "payloads": payloads,
+            "names": np.array([p.get("name") for p in payloads], dtype=object),
+        }
+        if self.ann:
+            state.update(self._build_ann(matrix, payloads))
+        return state
+
+    def _spill(self, matrix: np.ndarray) -> tuple[np.ndarray, str]:
+        """
+        Move `matrix` to a memory-mapped file, so that with quantization only
+        the compressed copy and the rows being rescored stay resident. The
+        file is named by its contents, so every worker holding the same
+        catalog maps, and page-caches, the same file.
+        """
+        digest = hashlib.sha256(matrix.data).hexdigest()[:16]
+        path = os.path.join(
+            self.spill_dir or tempfile.gettempdir(),
+            f"web7_vectors_{digest}_{matrix.shape[1]}.npy",
+        )
+        if not os.path.exists(path):
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            spilled = np.lib.format.open_memmap(
+                tmp_path, mode="w+", dtype=np.float32, shape=matrix.shape
+            )
+            spilled[:] = matrix
+            spilled.flush()
+            del spilled
+            os.replace(tmp_path, path)
+        return np.load(path, mmap_mode="r"), path
+
+    def _apply(self, state: dict) -> None:
+        previous = self.spill_path
+        for name, value in state.items():
+            setattr(self, name, value)
+        self._masks = {}
+        self.loaded = True
+        if previous and previous != self.spill_path:
+            self._unlink_spill(previous)
+
+    @staticmethod
+    def _unlink_spill(path: str) -> None:
+        # Searches and other workers still mapping the file keep their pages.
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+    def close(self) -> None:
+        if self.spill_path:
+            self._unlink_spill(self.spill_path)
+            self.spill_path = None
+
+    def _new_ann_index(self, dim: int):
+        return hnsw_class()(
+            dim,
+            m=int(os.getenv("HNSW_M", 16)),
+            ef_construction=int(os.getenv("HNSW_EF_CONSTRUCTION", 200)),
+            ef=int(os.getenv("HNSW_EF", 64)),
+        )
+
+    def _build_ann(self, matrix: np.ndarray, payloads: list[dict]) -> dict:
+        """
+        A copy of the HNSW graph brought in line with `matrix`: keys that are
+        gone are deleted, keys that are new or whose vector changed are
+        inserted. The live graph is left alone.
+        """
+        start = time.perf_counter()
+        keys = [p.get("name") or str(i) for i, p in enumerate(payloads)]
+        ann_rows = {key: row for row, key in enumerate(keys)}
+
+        if self.ann_index is not None:
+            index = copy.deepcopy(self.ann_index)
+        else:
+            index = None
+            if self.ann_path and os.path.exists(self.ann_path):
+                try:
+                    index = hnsw_class().load(self.ann_path)
+                    print(f"HNSW graph loaded {len(index)} points from {self.ann_path}")
+                except (OSError, ValueError) as e:
+                    print(f"ignoring unreadable HNSW graph {self.ann_path}: {e}")
+            if index is None:
+                index = self._new_ann_index(matrix.shape[1])
+
+        stale = [key for key in index.ids if key not in ann_rows]
+        for key in stale:
+            index.delete(key)
+
+        known = [key for key in ann_rows if key in index]
+        rows = np.array([ann_rows[key] for key in known], dtype=np.int64)
+        unchanged = (
+            np.isclose(
+                np.einsum("ij,ij->i", index.get_vectors(known), matrix[rows]), 1, atol=1e-5
+            )
+            if known
+            else np.empty(0, dtype=bool)
+        )
+        unchanged_keys = {key for key, same in zip(known, unchanged) if same}
+        inserted = [key for key in ann_rows if key not in unchanged_keys]
+        for key in inserted:
+            index.add(key, matrix[ann_rows[key]])
+
+        # Deleted nodes still cost traversal time; rebuild once they dominate.
+        if index.tombstone_ratio > 0.3:
+            index = index.compact()
+        if self.ann_path and (inserted or stale):
+            index.save(self.ann_path)
+        print(
+            f"HNSW graph updated: {len(inserted)} inserted, {len(stale)} deleted "
+            f"in {time.perf_counter() - start:.1f}s"
+        )
+        return {
+            "ann_index": index,
+            "_ann_rows": ann_rows,
+            "ann_inserted": self.ann_inserted + len(inserted),
+            "ann_deleted": self.ann_deleted + len(stale),
+        }
+
+    async def sync(self) -> int:
+        """
+        Pull every point of the collection from Qdrant into memory.
+        """
+        vectors, payloads = [], []
+        offset = None
+        while True:
+            points, offset = await self.remote.client.scroll(
+                collection_name=self.collection_name,
+                limit=256,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True,
+            )
+            for point in points:
+                vectors.append(point.vector)
+                payloads.append(point.payload)
+            if offset is None:
+                break
+
+        await self.update_points(vectors, payloads)
+        print(f"local index synced {len(payloads)} points from {self.collection_name}")
+        return len(payloads)
+
+    def load_snapshot(self, path: str) -> int:
+        """
+        Serve the index from a snapshot file written by `web7.search.snapshot`.
+        """
+        snapshot = load_snapshot(
+            path,
+            model=EMBEDDING_MODEL,
+            dim=self.remote.encoder.dim,
+        )
+        self.set_points(
+            snapshot.vectors, snapshot.payloads(), normalized=snapshot.normalized
+        )
+        print(f"local index loaded {len(snapshot)} points from {path}")
+        return len(snapshot)
+
+    def save_snapshot(self, path: str) -> None:
+        write_snapshot(
+            path, self.vectors, self.payloads, model=EMBEDDING_MODEL, normalized=True
+        )
+
+    async def ensure_loaded(self) -> None:
+        if self.loaded:
+            return
+        async with self._lock:
+            if not self.loaded:
+                await self.sync()
+
+    def filter_mask(self, names: Iterable[str]) -> np.ndarray:
+        """
+        Boolean mask equivalent to a Qdrant `MatchAny` on the `name` field.
+        """
+        key = frozenset(names)
+        mask = self._masks.get(key)
+        if mask is None:
+            mask = np.isin(self.names, list(key))
+            self._masks[key] = mask
+        return mask
+
+    def _rank(
+        self, scores: np.ndarray, k: int, mask: Optional[np.ndarray] = None
+    ) -> list[tuple[int, float]]:
+        if mask is not None:
+            k = min(k, int(mask.sum()))
+            scores = np.where(mask, scores, -np.inf)
+
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+
+        candidates = np.argpartition(-scores, k - 1)[:k]
+        ranked = candidates[np.argsort(-scores[candidates])]
+        return [(int(i), float(scores[i])) for i in ranked]
+
+    def top_k(
+        self, query_vector, k: int, names: Optional[Iterable[str]] = None
+    ) -> list[tuple[int, float]]:
+        return self.top_k_batch([query_vector], [k], names=names)[0]
+
+    def top_k_batch(
+        self, query_vectors, ks: list[int], names: Optional[Iterable[str]] = None
+    ) -> list[list[tuple[int, float]]]:
+        """
+        `top_k` for several queries at once, scored with one matrix multiply.
+        """
+        if not len(self.payloads):
+            return [[] for _ in ks]
+
+        mask = self.filter_mask(names) if names is not None else None
+        scores = self.scores(query_vectors, mask)
+        return [self._rank(row, k, mask) for row, k in zip(scores, ks)]
+
+    def scores(self, query_vectors, mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Cosine similarity of each query vector to every point, one row per query.
+
+        With an HNSW graph or quantization, only the top `rescore` candidates
+        of the approximate pass (within `mask`) get their exact score; every
+        other point is -inf. Binary quantization rescores
+        `binary_oversample` times as many.
+        """
+        queries = np.asarray(query_vectors, dtype=np.float32)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms > 0, norms, 1)
+        if len(self.payloads) <= self.rescore or (
+            self.ann_index is None and self.quantized is None
+        ):
+            return queries @ self.vectors.T
+        if self.ann_index is not None:
+            return self._ann_scores(queries, mask)
+
+        approx = self.quantized.scores(queries)
+        if mask is not None:
+            approx[:, ~mask] = -np.inf
+        n = self.rescore
+        if self.quantized.mode == "binary":
+            n *= self.binary_oversample
+        n = min(n, len(self.payloads))
+        scores = np.full_like(approx, -np.inf)
+        for row, query, candidates in zip(
+            scores, queries, np.argpartition(-approx, n - 1, axis=1)[:, :n]
+        ):
+            # Sorted row ids keep the reads from a memory-mapped file sequential.
+            candidates = np.sort(candidates)
+            row[candidates] = self.vectors[candidates] @ query
+        if mask is not None:
+            scores[:, ~mask] = -np.inf
+        return scores
+
+    def _ann_scores(self, queries: np.ndarray, mask: Optional[np.ndarray]) -> np.ndarray:
+        scores = np.full((len(queries), len(self.payloads)), -np.inf, dtype=np.float32)
+        if mask is not None and mask.sum() <= self.rescore:
+            # A narrow filter is cheaper to scan than to search the graph for.
+            scores[:, mask] = queries @ self.vectors[mask].T
+            return scores
+
+        # Filtered graph search: widen the candidate list by the share of
+        # points the filter removes.
+        n = self.rescore
+        if mask is not None:
+            n = min(len(self.payloads), int(n * len(mask) / mask.sum()))
+        for row, query in zip(scores, queries):
+            candidates = np.sort(
+                [self._ann_rows[key] for key, _ in self.ann_index.search(query, n)]
+            ).astype(np.int64)
+            row[candidates] = self.vectors[candidates] @ query
+        if mask is not None:
+            scores[:, ~mask] = -np.inf
+        return scores
+
+    def ann_stats(self) -> Optional[dict]:
+        if self.ann_index is None:
+            return None
+        return {
+            **self.ann_index.stats(),
+            "candidates": self.rescore,
+            "inserted": self.ann_inserted,
+            "deleted": self.ann_deleted,
+            "path": self.ann_path or None,
+        }
+
+    async def rank_batch(
+        self,
+        queries: list[str],
+        query_vectors,
+        ks: list[int],
+        names: Optional[Iterable[str]] = None,
+    ) -> list[list[tuple[int, float]]]:
+        """
+        Ranked (index, score) hits per query; subclasses can use the query
+        text as well as its vector.
+        """
+        return self.top_k_batch(query_vectors, ks, names=names)
+
+    async def search(self, search_query: SearchQuery) -> SearchResponse:
+        return (await self.search_batch([search_query]))[0]
+
+    async def search_batch(
+        self, search_queries: list[SearchQuery]
+    ) -> list[SearchResponse]:
+        queries = [search_query.query for search_query in search_queries]
+        try:
+            await self.ensure_loaded()
+            if len(queries) == 1:
+                query_vectors = [await self.embedding_service.embed(queries[0])]
+            else:
+                query_vectors = await self.embedding_service.embed_many(queries)
+            # rank_batch reads the catalog before its first await, so these
+            # are the payloads its row ids refer to even if an update lands
+            # while it runs.
+            payloads = self.payloads
+            hits = await self.rank_batch(
+                queries,
+                query_vectors,
+                [search_query.k for search_query in search_queries],
+                names=allowed_servers(),
+            )
+        except Exception as e:
+            print(f"An error occurred during local search: {e}")
+            return [
+                SearchResponse(success=False, query=query, servers=[])
+                for query in queries
+            ]
+
+        return [
+            SearchResponse(
+                success=True,
+                query=query,
+                servers=[
+                    to_mcp_response(payloads[i], score) for i, score in query_hits
+                ],
+            )
+            for query, query_hits in zip(queries, hits)
+        ]
+
+    async def health_check(self):
+        return {
+            "status": "healthy" if self.loaded else "not-loaded",
+            "database": "local-index",
+            "points": len(self.payloads),
+        }
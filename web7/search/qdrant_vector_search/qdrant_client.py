@@ -1,15 +1,69 @@
 from qdrant_client import AsyncQdrantClient, models
 import csv
-from uuid import uuid4
-from sentence_transformers import SentenceTransformer
+import hashlib
+import orjson
+from uuid import NAMESPACE_URL, uuid5
 from dotenv import load_dotenv
 import os
 from dataclasses import dataclass
 from typing import List, Optional
 from web7.models import SearchResponse, MCPResponse, TransportType, SearchQuery
+from web7 import resources
 
 load_dotenv()
 
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+DEFAULT_ALLOWED_SERVERS = "Gmail,Notion,Slack,Googlemeet"
+# Payload fields with a Qdrant keyword index, so filters on them are cheap.
+INDEXED_FIELDS = ["name"]
+
+
+def point_id(key: str) -> str:
+    """
+    Deterministic Qdrant point id for a catalog entry, so re-ingesting the same
+    server overwrites its point instead of adding a duplicate.
+    """
+    return str(uuid5(NAMESPACE_URL, f"web7:{key}"))
+
+
+def content_hash(doc: dict) -> str:
+    return hashlib.sha256(orjson.dumps(doc, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+def to_mcp_response(payload: dict, score: Optional[float] = None) -> MCPResponse:
+    return MCPResponse(
+        name=payload["name"],
+        transport=TransportType.STREAMABLE_HTTP,
+        url=str(os.getenv(payload["name"])),
+        image_url=payload.get("image"),
+        score=score,
+    )
+
+
+def allowed_servers() -> Optional[list[str]]:
+    """
+    Server names searches are restricted to, from the comma-separated
+    SEARCH_ALLOWED_SERVERS; "*" allows every server in the catalog.
+    """
+    value = os.getenv("SEARCH_ALLOWED_SERVERS", DEFAULT_ALLOWED_SERVERS).strip()
+    if value in ("", "*"):
+        return None
+    return sorted({name.strip() for name in value.split(",") if name.strip()})
+
+
+def server_filter() -> Optional[models.Filter]:
+    names = allowed_servers()
+    if names is None:
+        return None
+    return models.Filter(
+        must=[
+            models.FieldCondition(
+                key="name",
+                match=models.MatchAny(any=names),
+            )
+        ]
+    )
+
 
 class QdrantVectorDb:
     def __init__(self):
@@ -17,49 +71,78 @@ class QdrantVectorDb:
             url="https://34b705cd-636f-4f05-a4ce-440d4a8cbc10.us-west-1-0.aws.cloud.qdrant.io:6333",
             api_key=os.getenv("QDRANT_API_KEY"),
         )
-        self.encoder = SentenceTransformer("all-MiniLM-L6-v2")
+        self.model_name = EMBEDDING_MODEL
         self.mcp_collection_name = "mcp_servers"
 
+    @property
+    def encoder(self):
+        return resources.encoder()
+
+    @property
+    def embedding_service(self):
+        return resources.embedding_service()
+
     async def search(self, search_query: SearchQuery) -> SearchResponse:
         query = search_query.query
         k = search_query.k
         try:
-            query_vector = self.encoder.encode(query).tolist()
+            query_vector = (await self.embedding_service.embed(query)).tolist()
 
             search_result = await self.client.query_points(
                 collection_name=self.mcp_collection_name,
                 query=query_vector,
                 limit=k,
                 with_payload=True,
-                query_filter=models.Filter(
-                    must=[
-                        models.FieldCondition(
-                            key="name",
-                            match=models.MatchAny(
-                                any=["Gmail", "Notion", "Slack","Googlemeet"]
-                            ),
-                        )
-                    ]
-                ),
+                query_filter=server_filter(),
             )
 
             print("SEARCH RESULT: ", search_result)
             output = [point for point in search_result][0][1]
-            results = [
-                MCPResponse(
-                    name=point.payload["name"],
-                    transport=TransportType.STREAMABLE_HTTP,
-                    url=str(os.getenv(point.payload["name"])),
-                    image_url=point.payload["image"],
-                )
-                for point in output
-            ]
+            results = [to_mcp_response(point.payload, point.score) for point in output]
 
             return SearchResponse(success=True, query=query, servers=results)
         except Exception as e:
             print(f"An error occurred during search: {e}")
             return SearchResponse(success=False, query=query, servers=[])
 
+    async def search_batch(
+        self, search_queries: List[SearchQuery]
+    ) -> List[SearchResponse]:
+        try:
+            query_vectors = await self.embedding_service.embed_many(
+                [search_query.query for search_query in search_queries]
+            )
+            batch_result = await self.client.query_batch_points(
+                collection_name=self.mcp_collection_name,
+                requests=[
+                    models.QueryRequest(
+                        query=query_vector.tolist(),
+                        limit=search_query.k,
+                        with_payload=True,
+                        filter=server_filter(),
+                    )
+                    for search_query, query_vector in zip(search_queries, query_vectors)
+                ],
+            )
+        except Exception as e:
+            print(f"An error occurred during batch search: {e}")
+            return [
+                SearchResponse(success=False, query=search_query.query, servers=[])
+                for search_query in search_queries
+            ]
+
+        return [
+            SearchResponse(
+                success=True,
+                query=search_query.query,
+                servers=[
+                    to_mcp_response(point.payload, point.score)
+                    for point in result.points
+                ],
+            )
+            for search_query, result in zip(search_queries, batch_result)
+        ]
+
     async def health_check(self):
         try:
             await self.client.get_collections()
@@ -75,24 +158,38 @@ class QdrantVectorDb:
         await self.client.create_collection(
             collection_name,
             vectors_config=models.VectorParams(
-                size=self.encoder.get_sentence_embedding_dimension(),
+                size=self.encoder.dim,
                 distance=models.Distance.COSINE,
             ),
         )
+        await self.create_payload_indexes(collection_name)
+
+    async def create_payload_indexes(self, collection_name: str):
+        for field_name in INDEXED_FIELDS:
+            await self.client.create_payload_index(
+                collection_name,
+                field_name=field_name,
+                field_schema=models.PayloadSchemaType.KEYWORD,
+            )
 
     async def delete_collection(self, collection_name: str):
         await self.client.delete_collection(collection_name)
 
     async def upload_to_collection(
-        self, payload: list, collection_name: str, vector_field: str = "description"
+        self,
+        payload: list,
+        collection_name: str,
+        vector_field: str = "description",
+        key_field: str = "name",
     ):
+        vectors = self.encoder.encode([doc[vector_field] for doc in payload])
         points_to_upload = [
             models.PointStruct(
-                id=str(uuid4()),
-                vector=self.encoder.encode(doc[vector_field]).tolist(),
-                payload=doc,
+                id=point_id(doc[key_field]),
+                vector=vector.tolist(),
+                payload={**doc, "content_hash": content_hash(doc)},
             )
-            for doc in payload
+            for doc, vector in zip(payload, vectors)
         ]
 
         await self.client.upload_points(
@@ -0,0 +1,80 @@
+"""
+Compressed copies of the catalog vectors for an approximate first pass.
+
+"int8" keeps one signed byte per dimension with a per-dimension scale (4x
+smaller than float32). It saves memory, not time: the codes are widened back
+to float32 block by block, so a full pass is somewhat slower than the plain
+float32 product. "binary" keeps only the sign bit (32x smaller) and ranks by
+Hamming distance, which is several times faster but much coarser, so it needs
+a far larger rescore pool. Either way the index rescores the best candidates
+exactly against the float vectors, which stay in a memory-mapped file and
+out of the resident set.
+"""
+
+import numpy as np
+
+MODES = ("int8", "binary")
+# Rows scored per block, which bounds the float32 temporaries of a query.
+BLOCK_ROWS = 4096
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _popcount(bits: np.ndarray) -> np.ndarray:
+    """
+    Set bits per row of a packed uint8 array.
+    """
+    if hasattr(np, "bitwise_count"):  # numpy >= 2.0
+        if bits.shape[1] % 8 == 0:
+            bits = np.ascontiguousarray(bits).view(np.uint64)
+        return np.bitwise_count(bits).sum(axis=1, dtype=np.int32)
+    return _POPCOUNT[bits].sum(axis=1, dtype=np.int32)
+
+
+class QuantizedVectors:
+    def __init__(self, vectors, mode: str = "int8"):
+        if mode not in MODES:
+            raise ValueError(f"unknown quantization {mode!r}, expected one of {MODES}")
+        self.mode = mode
+        self.count, self.dim = vectors.shape
+
+        if mode == "int8":
+            # Symmetric per-dimension scale, so a query only needs one rescale.
+            self.scale = np.zeros(self.dim, dtype=np.float32)
+            for start in range(0, self.count, BLOCK_ROWS):
+                block = np.abs(vectors[start : start + BLOCK_ROWS])
+                np.maximum(self.scale, block.max(axis=0), out=self.scale)
+            self.scale = np.where(self.scale > 0, self.scale / 127, 1).astype(np.float32)
+            self.codes = np.empty((self.count, self.dim), dtype=np.int8)
+            for start in range(0, self.count, BLOCK_ROWS):
+                block = vectors[start : start + BLOCK_ROWS] / self.scale
+                self.codes[start : start + BLOCK_ROWS] = np.clip(
+                    np.rint(block), -127, 127
+                )
+        else:
+            self.codes = np.packbits(np.asarray(vectors) > 0, axis=1)
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + (self.scale.nbytes if self.mode == "int8" else 0)
+
+    def scores(self, queries: np.ndarray) -> np.ndarray:
+        """
+        Approximate similarity of each query to every row; higher is closer.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        out = np.empty((len(queries), self.count), dtype=np.float32)
+
+        if self.mode == "int8":
+            scaled = (queries * self.scale).T
+            for start in range(0, self.count, BLOCK_ROWS):
+                block = self.codes[start : start + BLOCK_ROWS].astype(np.float32)
+                out[:, start : start + BLOCK_ROWS] = (block @ scaled).T
+            return out
+
+        bits = np.packbits(queries > 0, axis=1)
+        for q, query_bits in enumerate(bits):
+            for start in range(0, self.count, BLOCK_ROWS):
+                block = self.codes[start : start + BLOCK_ROWS]
+                out[q, start : start + BLOCK_ROWS] = -_popcount(block ^ query_bits)
+        return out
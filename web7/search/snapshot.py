@@ -0,0 +1,237 @@
+"""
+Versioned on-disk snapshot of the catalog embeddings.
+
+Layout (all integers little-endian):
+
+    magic      4 bytes   b"W7VS"
+    version    uint32
+    header_len uint32
+    header     header_len bytes of JSON: model, dim, count, normalized and
+               the byte offsets of the blocks below
+    vectors    count * dim float32, 64-byte aligned
+    index      (count + 1) uint64 offsets into the payload block
+    payloads   concatenated JSON documents
+
+The vector block is opened with `np.memmap`, so every worker process that
+loads the same file shares one page-cached copy.
+"""
+
+import asyncio
+import csv
+import os
+import struct
+import time
+
+import click
+import numpy as np
+import orjson
+
+MAGIC = b"W7VS"
+VERSION = 1
+ALIGNMENT = 64
+_PREAMBLE = struct.Struct("<4sII")
+
+CATALOG_CSV = os.path.join(
+    os.path.dirname(__file__), "qdrant_vector_search", "composio-servers.csv"
+)
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_snapshot(
+    path: str,
+    vectors,
+    payloads: list[dict],
+    model: str,
+    normalized: bool = False,
+    extra: dict | None = None,
+) -> None:
+    """
+    Write `vectors` and their `payloads` to `path` atomically. `extra` keys
+    are stored in the header alongside the layout fields.
+    """
+    matrix = np.ascontiguousarray(vectors, dtype=np.float32)
+    if matrix.ndim != 2 or len(matrix) != len(payloads):
+        raise SnapshotError(
+            f"expected {len(payloads)} vectors, got array of shape {matrix.shape}"
+        )
+
+    encoded = [orjson.dumps(payload) for payload in payloads]
+    offsets = np.zeros(len(encoded) + 1, dtype="<u8")
+    np.cumsum([len(doc) for doc in encoded], out=offsets[1:])
+
+    header = {
+        **(extra or {}),
+        "model": model,
+        "dim": int(matrix.shape[1]),
+        "count": int(matrix.shape[0]),
+        "normalized": normalized,
+        "created_at": time.time(),
+    }
+    # Offsets depend on the header length, so reserve room for them first.
+    header.update(vector_offset=0, index_offset=0, payload_offset=0)
+    header_len = len(orjson.dumps(header)) + 64
+    vector_offset = _align(_PREAMBLE.size + header_len)
+    index_offset = _align(vector_offset + matrix.nbytes)
+    payload_offset = index_offset + offsets.nbytes
+    header.update(
+        vector_offset=vector_offset,
+        index_offset=index_offset,
+        payload_offset=payload_offset,
+    )
+    header_bytes = orjson.dumps(header).ljust(header_len)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(_PREAMBLE.pack(MAGIC, VERSION, header_len))
+        file.write(header_bytes)
+        file.seek(vector_offset)
+        file.write(matrix.astype("<f4", copy=False).tobytes())
+        file.seek(index_offset)
+        file.write(offsets.tobytes())
+        for doc in encoded:
+            file.write(doc)
+    os.replace(tmp_path, path)
+
+
+class Snapshot:
+    """
+    Read-only view of a snapshot file. `vectors` is a memory-mapped array and
+    payloads are decoded on demand.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as file:
+            preamble = file.read(_PREAMBLE.size)
+            if len(preamble) < _PREAMBLE.size:
+                raise SnapshotError(f"{path} is too short to be a snapshot")
+            magic, version, header_len = _PREAMBLE.unpack(preamble)
+            if magic != MAGIC:
+                raise SnapshotError(f"{path} is not a web7 vector snapshot")
+            if version != VERSION:
+                raise SnapshotError(
+                    f"{path} has snapshot version {version}, expected {VERSION}"
+                )
+            self.header = orjson.loads(file.read(header_len))
+
+        self.model: str = self.header["model"]
+        self.dim: int = self.header["dim"]
+        self.count: int = self.header["count"]
+        self.normalized: bool = self.header["normalized"]
+
+        if self.count == 0:
+            # np.memmap refuses zero-length mappings.
+            self.vectors = np.empty((0, self.dim), dtype="<f4")
+            self._offsets = np.zeros(1, dtype="<u8")
+            self._payloads = np.empty(0, dtype=np.uint8)
+            return
+
+        self.vectors = np.memmap(
+            path,
+            dtype="<f4",
+            mode="r",
+            offset=self.header["vector_offset"],
+            shape=(self.count, self.dim),
+        )
+        self._offsets = np.memmap(
+            path,
+            dtype="<u8",
+            mode="r",
+            offset=self.header["index_offset"],
+            shape=(self.count + 1,),
+        )
+        self._payloads = np.memmap(
+            path,
+            dtype=np.uint8,
+            mode="r",
+            offset=self.header["payload_offset"],
+            shape=(int(self._offsets[-1]),),
+        )
+
+    def __len__(self) -> int:
+        return self.count
+
+    def payload(self, i: int) -> dict:
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        return orjson.loads(self._payloads[start:end].tobytes())
+
+    def payloads(self) -> list[dict]:
+        return [self.payload(i) for i in range(self.count)]
+
+
+def load_snapshot(
+    path: str, model: str | None = None, dim: int | None = None
+) -> Snapshot:
+    """
+    Open `path` and check that it was built with the expected embedding model
+    and dimension.
+    """
+    snapshot = Snapshot(path)
+    if model is not None and snapshot.model != model:
+        raise SnapshotError(
+            f"{path} was built with {snapshot.model!r}, expected {model!r}"
+        )
+    if dim is not None and snapshot.dim != dim:
+        raise SnapshotError(f"{path} has dimension {snapshot.dim}, expected {dim}")
+    return snapshot
+
+
+def read_catalog_csv(csv_path: str):
+    with open(csv_path, newline="") as file:
+        for row in csv.DictReader(file):
+            yield row
+
+
+@click.group()
+def cli():
+    """Export catalog embedding snapshots."""
+
+
+@cli.command("from-qdrant")
+@click.argument("output")
+@click.option("--collection", default=None, help="Qdrant collection to export.")
+def export_from_qdrant(output: str, collection: str | None):
+    """Export every point of a Qdrant collection to OUTPUT."""
+    from .local_vector_index import LocalVectorIndex
+
+    index = LocalVectorIndex(collection_name=collection)
+    asyncio.run(index.sync())
+    index.save_snapshot(output)
+    click.echo(f"wrote {len(index)} vectors to {output}")
+
+
+@cli.command("from-csv")
+@click.argument("output")
+@click.option(
+    "--csv",
+    "csv_path",
+    default=CATALOG_CSV,
+    help="CSV produced by composio-servers.py.",
+)
+@click.option("--field", default="description", help="Column to embed.")
+@click.option("--batch-size", default=64, help="Encoder batch size.")
+def export_from_csv(output: str, csv_path: str, field: str, batch_size: int):
+    """Embed the Composio CSV and write the vectors to OUTPUT."""
+    from .encoders import create_encoder
+    from .qdrant_vector_search.qdrant_client import EMBEDDING_MODEL
+
+    payloads = list(read_catalog_csv(csv_path))
+    encoder = create_encoder()
+    vectors = encoder.encode(
+        [payload[field] for payload in payloads],
+        batch_size=batch_size,
+        normalize_embeddings=True,
+    )
+    write_snapshot(output, vectors, payloads, model=EMBEDDING_MODEL, normalized=True)
+    click.echo(f"wrote {len(payloads)} vectors to {output}")
+
+
+if __name__ == "__main__":
+    cli()
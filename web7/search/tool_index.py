@@ -0,0 +1,170 @@
+"""
+Semantic index of individual MCP tools.
+
+The server index answers "which MCP server handles this task"; this one ranks
+the tools those servers expose, embedded from their name, description and
+argument names, so a step only gets the few tool schemas it is likely to
+call. Listings come from Letta through the MCP registry and are re-embedded
+only when a server's tool list changes. The index can be kept in a snapshot
+file in the same format as the server index snapshot.
+"""
+
+import asyncio
+import os
+from typing import Iterable, Optional
+
+import numpy as np
+import orjson
+
+from .. import resources
+from .qdrant_vector_search.qdrant_client import EMBEDDING_MODEL, content_hash
+from .snapshot import load_snapshot, write_snapshot
+
+
+def tool_text(tool) -> str:
+    schema = tool.input_schema or {}
+    args = ", ".join(schema.get("properties", {}))
+    text = f"{tool.name.replace('_', ' ')}: {tool.description or ''}"
+    return f"{text} ({args})" if args else text
+
+
+def schema_size(tool) -> int:
+    """
+    Characters the tool's definition adds to the agent's prompt.
+    """
+    return len(
+        orjson.dumps(
+            {"name": tool.name, "description": tool.description, "schema": tool.input_schema}
+        )
+    )
+
+
+class ToolIndex:
+    def __init__(self, snapshot_path: str | None = None):
+        self.snapshot_path = (
+            snapshot_path
+            if snapshot_path is not None
+            else os.getenv("TOOL_INDEX_SNAPSHOT", "")
+        )
+        self.payloads: list[dict] = []
+        self.vectors = np.empty((0, 0), dtype=np.float32)
+        self._hashes: dict[str, str] = {}
+        self._save_lock = asyncio.Lock()
+        self.embedded = 0
+        if self.snapshot_path and os.path.exists(self.snapshot_path):
+            self.load_snapshot(self.snapshot_path)
+
+    def __len__(self) -> int:
+        return len(self.payloads)
+
+    @property
+    def servers(self) -> set[str]:
+        return set(self._hashes)
+
+    def load_snapshot(self, path: str) -> None:
+        snapshot = load_snapshot(path, model=EMBEDDING_MODEL)
+        self.payloads = snapshot.payloads()
+        self.vectors = np.asarray(snapshot.vectors, dtype=np.float32)
+        self._hashes = snapshot.header.get("servers", {})
+        print(f"tool index loaded {len(self.payloads)} tools from {path}")
+
+    def save_snapshot(self, path: str) -> None:
+        write_snapshot(
+            path,
+            self.vectors,
+            self.payloads,
+            model=EMBEDDING_MODEL,
+            normalized=True,
+            extra={"servers": dict(self._hashes)},
+        )
+
+    async def _save(self) -> None:
+        # One writer at a time, since snapshots share a temporary file. The
+        # arrays are replaced rather than mutated, so a save in progress sees
+        # a consistent state.
+        async with self._save_lock:
+            await asyncio.to_thread(
+                write_snapshot,
+                self.snapshot_path,
+                self.vectors,
+                self.payloads,
+                model=EMBEDDING_MODEL,
+                normalized=True,
+                extra={"servers": dict(self._hashes)},
+            )
+
+    async def index_server(self, server: str, tools: list) -> bool:
+        """
+        (Re-)index `server`'s tools. Returns False when its listing is
+        unchanged since it was last indexed.
+        """
+        digest = content_hash(
+            {"tools": [[tool.name, tool.description or ""] for tool in tools]}
+        )
+        if self._hashes.get(server) == digest:
+            return False
+
+        vectors = np.empty((0, 0), dtype=np.float32)
+        if tools:
+            vectors = await resources.embedding_service().embed_many(
+                [tool_text(tool) for tool in tools]
+            )
+            vectors = np.asarray(vectors, dtype=np.float32).reshape(len(tools), -1)
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12
+            self.embedded += len(tools)
+
+        # No awaits from here to the swap: other servers may have been
+        # indexed while this one was embedding, and their rows must survive.
+        keep = [i for i, payload in enumerate(self.payloads) if payload["server"] != server]
+        payloads = [self.payloads[i] for i in keep] + [
+            {
+                "server": server,
+                "name": tool.name,
+                "description": tool.description,
+                "schema_chars": schema_size(tool),
+            }
+            for tool in tools
+        ]
+        if not tools:
+            # A server without tools only loses its old entries.
+            vectors = self.vectors[keep]
+        elif len(self.vectors):
+            vectors = np.concatenate([self.vectors[keep], vectors])
+        self.payloads, self.vectors = payloads, vectors
+        self._hashes[server] = digest
+
+        if self.snapshot_path:
+            await self._save()
+        return True
+
+    def top_k(
+        self, query_vector, k: int, servers: Optional[Iterable[str]] = None
+    ) -> list[tuple[dict, float]]:
+        """
+        The `k` tools closest to the query, optionally only from `servers`.
+        """
+        if not self.payloads:
+            return []
+
+        query = np.asarray(query_vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) + 1e-12)
+        scores = self.vectors @ query
+        if servers is not None:
+            allowed = set(servers)
+            mask = np.array([payload["server"] in allowed for payload in self.payloads])
+            scores = np.where(mask, scores, -np.inf)
+            k = min(k, int(mask.sum()))
+
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+        candidates = np.argpartition(-scores, k - 1)[:k]
+        ranked = candidates[np.argsort(-scores[candidates])]
+        return [(self.payloads[i], float(scores[i])) for i in ranked]
+
+    def stats(self) -> dict:
+        return {
+            "servers": len(self._hashes),
+            "tools": len(self.payloads),
+            "embedded": self.embedded,
+        }
@@ -1,14 +1,129 @@
-from .qdrant_vector_search.qdrant_client import QdrantVectorDb
-from ..models import SearchQuery
+import os
+
+from .embedding_service import EmbeddingService
+from .hybrid_index import HybridVectorIndex
+from .local_vector_index import LocalVectorIndex
+from .qdrant_vector_search.qdrant_client import allowed_servers
+from .. import resources
+from ..cache import SingleFlight, TTLCache
+from ..models import SearchQuery, SearchResponse
 from fastapi import HTTPException
 
-vector_service = QdrantVectorDb()
+# Results for identical (query, k, filter) lookups are shared until the
+# catalog changes or the entry expires.
+result_cache = TTLCache(
+    maxsize=int(os.getenv("SEARCH_CACHE_SIZE", 2048)),
+    ttl=float(os.getenv("SEARCH_CACHE_TTL", 300)),
+)
+_in_flight = SingleFlight()
+
+
+def create_vector_service():
+    # "hybrid" and "local" serve searches from an in-process copy of the
+    # catalog that is synced from Qdrant once, with and without lexical
+    # fusion; "qdrant" queries the remote cluster every time.
+    backend = os.getenv("VECTOR_BACKEND", "hybrid")
+    if backend == "qdrant":
+        return resources.qdrant()
+
+    service = HybridVectorIndex() if backend == "hybrid" else LocalVectorIndex()
+    if os.getenv("VECTOR_SNAPSHOT"):
+        service.load_snapshot(os.getenv("VECTOR_SNAPSHOT"))
+    return service
+
+
+async def _search(search_query: SearchQuery, key: tuple) -> SearchResponse:
+    result = await resources.vector_service().search(search_query=search_query)
+    if result.success:
+        result_cache.set(key, result)
+    return result
+
+
+def _cache_key(query: str, k: int) -> tuple:
+    names = allowed_servers()
+    return (EmbeddingService.normalize(query), k, tuple(names) if names else None)
 
 
 async def search_vectors(query: str, k: int):
+    key = _cache_key(query, k)
+    result = result_cache.get(key)
+    if result is not None:
+        return result
+
     search_query = SearchQuery(query=query, k=k)
     try:
-        result = await vector_service.search(search_query=search_query)
-        return result
+        return await _in_flight.do(key, lambda: _search(search_query, key))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
+
+
+async def search_vectors_batch(search_queries: list[SearchQuery]) -> list[SearchResponse]:
+    """
+    Search for every query at once: cached results are reused and the rest
+    are embedded in one model call and scored in one backend query.
+    """
+    keys = [_cache_key(q.query, q.k) for q in search_queries]
+    results = [result_cache.get(key) for key in keys]
+    missing = {
+        key: search_query
+        for key, search_query, result in zip(keys, search_queries, results)
+        if result is None
+    }
+
+    if missing:
+        try:
+            fetched = await resources.vector_service().search_batch(
+                list(missing.values())
+            )
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
+        found = dict(zip(missing, fetched))
+        for key, result in found.items():
+            if result.success:
+                result_cache.set(key, result)
+        results = [
+            result if result is not None else found[key]
+            for key, result in zip(keys, results)
+        ]
+
+    return results
+
+
+def invalidate_search_cache() -> None:
+    result_cache.invalidate()
+
+
+async def sync_catalog() -> int:
+    """
+    Re-pull the catalog into the local index. No-op for the remote backend.
+    """
+    service = resources.vector_service()
+    invalidate_search_cache()
+    if isinstance(service, LocalVectorIndex):
+        points = await service.sync()
+        invalidate_search_cache()
+        return points
+    return 0
+
+
+def search_stats() -> dict:
+    """
+    Stats of the search components that are already loaded; reporting never
+    loads the encoder or syncs the index itself.
+    """
+    stats = {
+        "embedding": (
+            resources.embedding_service().stats()
+            if resources.registry.loaded("embedding_service")
+            else None
+        ),
+        "results": {**result_cache.stats(), "in_flight": _in_flight.stats()},
+    }
+    if not resources.registry.loaded("vector_service"):
+        return stats
+    service = resources.vector_service()
+    if isinstance(service, HybridVectorIndex):
+        stats["retrieval"] = service.stats()
+    if isinstance(service, LocalVectorIndex) and service.ann_index is not None:
+        stats["ann"] = service.ann_stats()
+    return stats
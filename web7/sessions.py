@@ -0,0 +1,279 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional
+
+from .models import WorkflowSession
+
+# Events that change what a reader polling the session needs to see first.
+# Everything else (logs, spans, metrics, progress) is written in batches.
+PERSIST_EVENTS = {"status", "step_added", "step_updated", "step_status"}
+
+
+def _session_size(session: WorkflowSession) -> int:
+    """
+    Rough in-memory footprint of a session, dominated by its steps and logs.
+    """
+    return len(json.dumps(session.to_record(), default=str))
+
+
+class SessionStore(ABC):
+    """
+    Where workflow sessions live between requests.
+
+    Sessions added with `put` are persisted again when they publish events,
+    so callers only need to mutate the session object itself.
+    """
+
+    def __init__(self):
+        self.evicted = 0
+        self.expired = 0
+
+    @abstractmethod
+    def get(self, agent_id: str) -> Optional[WorkflowSession]: ...
+
+    @abstractmethod
+    def put(self, session: WorkflowSession) -> None: ...
+
+    @abstractmethod
+    def delete(self, agent_id: str) -> None: ...
+
+    @abstractmethod
+    def is_live(self, agent_id: str) -> bool:
+        """
+        Whether the session object is owned and updated by this process.
+        """
+
+    @abstractmethod
+    def metrics(self) -> dict: ...
+
+    def __contains__(self, agent_id: str) -> bool:
+        return self.get(agent_id) is not None
+
+
+class InMemorySessionStore(SessionStore):
+    """
+    Process-local store. Finished sessions are evicted once they are older
+    than `ttl` seconds, and least-recently-used finished sessions go first
+    when there are more than `max_sessions` or they take more than
+    `max_bytes`. Running sessions are never evicted.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 1000,
+        ttl: float = 3600,
+        max_bytes: int = 256 * 1024 * 1024,
+    ):
+        super().__init__()
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._sessions: OrderedDict[str, WorkflowSession] = OrderedDict()
+        self._sizes: dict[str, int] = {}
+
+    def get(self, agent_id: str) -> Optional[WorkflowSession]:
+        session = self._sessions.get(agent_id)
+        if session is not None:
+            self._sessions.move_to_end(agent_id)
+        return session
+
+    def put(self, session: WorkflowSession) -> None:
+        self._sessions[session.agent_id] = session
+        self._sessions.move_to_end(session.agent_id)
+        session.events.subscribe(lambda event: self._on_event(session, event))
+        self.evict()
+
+    def _on_event(self, session: WorkflowSession, event: dict) -> None:
+        if event["type"] == "status" and session.is_finished:
+            self._sizes[session.agent_id] = _session_size(session)
+            self.evict()
+
+    def delete(self, agent_id: str) -> None:
+        self._sessions.pop(agent_id, None)
+        self._sizes.pop(agent_id, None)
+
+    def is_live(self, agent_id: str) -> bool:
+        return agent_id in self._sessions
+
+    def _finished(self) -> list[WorkflowSession]:
+        # OrderedDict order is least recently used first.
+        return [s for s in self._sessions.values() if s.is_finished]
+
+    def evict(self) -> None:
+        cutoff = time.time() - self.ttl
+        for session in self._finished():
+            if session.updated_at.timestamp() < cutoff:
+                self.delete(session.agent_id)
+                self.expired += 1
+
+        finished = self._finished()
+        while finished and (
+            len(self._sessions) > self.max_sessions
+            or sum(self._sizes.values()) > self.max_bytes
+        ):
+            self.delete(finished.pop(0).agent_id)
+            self.evicted += 1
+
+    def metrics(self) -> dict:
+        finished = len(self._finished())
+        return {
+            "backend": "memory",
+            "live": len(self._sessions) - finished,
+            "finished": finished,
+            "evicted": self.evicted,
+            "expired": self.expired,
+            "finished_bytes": sum(self._sizes.values()),
+        }
+
+
+class SqliteSessionStore(SessionStore):
+    """
+    SQLite-backed store in WAL mode so every uvicorn worker sees the same
+    sessions. The worker running a workflow keeps the live object and writes
+    it back on step and status events; other workers read the latest row.
+    Other events are coalesced into one write at most `save_interval`
+    seconds later.
+    """
+
+    def __init__(self, path: str, ttl: float = 3600, save_interval: float = 1.0):
+        super().__init__()
+        self.path = path
+        self.ttl = ttl
+        self.save_interval = save_interval
+        self._live: dict[str, WorkflowSession] = {}
+        self._pending: dict[str, asyncio.TimerHandle] = {}
+        self._local = threading.local()
+        self.writes = 0
+        self.coalesced = 0
+
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS sessions (
+                    agent_id TEXT PRIMARY KEY,
+                    finished INTEGER NOT NULL,
+                    updated_at REAL NOT NULL,
+                    data TEXT NOT NULL
+                )
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5)
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def save(self, session: WorkflowSession) -> None:
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?)",
+                (
+                    session.agent_id,
+                    int(session.is_finished),
+                    session.updated_at.timestamp(),
+                    json.dumps(session.to_record(), default=str),
+                ),
+            )
+        self.writes += 1
+
+    def get(self, agent_id: str) -> Optional[WorkflowSession]:
+        session = self._live.get(agent_id)
+        if session is not None:
+            return session
+
+        row = (
+            self._connect()
+            .execute("SELECT data FROM sessions WHERE agent_id = ?", (agent_id,))
+            .fetchone()
+        )
+        return WorkflowSession.from_record(json.loads(row[0])) if row else None
+
+    def put(self, session: WorkflowSession) -> None:
+        self._live[session.agent_id] = session
+        session.events.subscribe(lambda event: self._on_event(session, event))
+        self.save(session)
+        self.evict()
+
+    def _on_event(self, session: WorkflowSession, event: dict) -> None:
+        if event["type"] in PERSIST_EVENTS or session.is_finished:
+            self._flush(session)
+        elif session.agent_id in self._pending:
+            self.coalesced += 1
+        else:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                self._flush(session)
+                return
+            self._pending[session.agent_id] = loop.call_later(
+                self.save_interval, self._flush, session
+            )
+
+    def _flush(self, session: WorkflowSession) -> None:
+        handle = self._pending.pop(session.agent_id, None)
+        if handle is not None:
+            handle.cancel()
+        self.save(session)
+        if session.is_finished:
+            # The row now holds the final state; stop pinning the object.
+            self._live.pop(session.agent_id, None)
+
+    def delete(self, agent_id: str) -> None:
+        handle = self._pending.pop(agent_id, None)
+        if handle is not None:
+            handle.cancel()
+        self._live.pop(agent_id, None)
+        with self._connect() as db:
+            db.execute("DELETE FROM sessions WHERE agent_id = ?", (agent_id,))
+
+    def is_live(self, agent_id: str) -> bool:
+        return agent_id in self._live
+
+    def evict(self) -> None:
+        with self._connect() as db:
+            cursor = db.execute(
+                "DELETE FROM sessions WHERE finished = 1 AND updated_at < ?",
+                (time.time() - self.ttl,),
+            )
+        self.expired += cursor.rowcount
+
+    def metrics(self) -> dict:
+        finished, total = (
+            self._connect()
+            .execute("SELECT COALESCE(SUM(finished), 0), COUNT(*) FROM sessions")
+            .fetchone()
+        )
+        return {
+            "backend": "sqlite",
+            "live": total - finished,
+            "finished": finished,
+            "live_in_this_worker": len(self._live),
+            "expired": self.expired,
+            "writes": self.writes,
+            "coalesced": self.coalesced,
+        }
+
+
+def create_session_store() -> SessionStore:
+    ttl = float(os.getenv("SESSION_TTL", 3600))
+    if os.getenv("SESSION_STORE", "memory") == "sqlite":
+        return SqliteSessionStore(
+            os.getenv("SESSION_DB_PATH", "web7_sessions.db"),
+            ttl,
+            save_interval=float(os.getenv("SESSION_SAVE_INTERVAL", 1.0)),
+        )
+    return InMemorySessionStore(
+        max_sessions=int(os.getenv("SESSION_MAX", 1000)),
+        ttl=ttl,
+        max_bytes=int(float(os.getenv("SESSION_MAX_MB", 256)) * 1024 * 1024),
+    )
@@ -0,0 +1,79 @@
+"""
+Latency spans for the phases of a workflow, and their percentiles across
+sessions.
+
+A span is a plain dict, {"name", "start" (epoch seconds), "duration_ms"}, so
+it can be built where no session is at hand (tool discovery runs ahead of
+its step) and serialized with the session as is.
+"""
+
+import os
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Optional
+
+import numpy as np
+
+
+def percentile(values, q: float) -> Optional[float]:
+    if not values:
+        return None
+    return round(float(np.percentile(values, q)), 3)
+
+
+class Stopwatch:
+    def __init__(self):
+        self.start = time.time()
+        self._perf = time.perf_counter()
+
+    @property
+    def elapsed_ms(self) -> float:
+        return round((time.perf_counter() - self._perf) * 1000, 2)
+
+    def span(self, name: str) -> dict:
+        """
+        A span named `name` from when the stopwatch started until now.
+        """
+        return {"name": name, "start": self.start, "duration_ms": self.elapsed_ms}
+
+
+@contextmanager
+def timed(spans: list, name: str):
+    """
+    Append a span covering the `with` block to `spans`, even if it raises.
+    """
+    watch = Stopwatch()
+    try:
+        yield watch
+    finally:
+        spans.append(watch.span(name))
+
+
+class PhaseTimings:
+    """
+    The last `window` durations of every phase, across all sessions.
+    """
+
+    def __init__(self, window: int | None = None):
+        self.window = window or int(os.getenv("TIMING_WINDOW", 1000))
+        self._samples: dict[str, deque] = defaultdict(lambda: deque(maxlen=self.window))
+        self.counts: dict[str, int] = defaultdict(int)
+
+    def record(self, span: dict) -> None:
+        self._samples[span["name"]].append(span["duration_ms"])
+        self.counts[span["name"]] += 1
+
+    def stats(self) -> dict:
+        return {
+            name: {
+                "count": self.counts[name],
+                "p50": percentile(values, 50),
+                "p95": percentile(values, 95),
+                "p99": percentile(values, 99),
+            }
+            for name, values in sorted(self._samples.items())
+        }
+
+
+phase_timings = PhaseTimings()